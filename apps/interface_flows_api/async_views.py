@@ -0,0 +1,259 @@
+import inspect
+from typing import Dict, Optional, Tuple, Type
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.authentication import get_authorization_header
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from apps.interface_flows_api.authentication import CachedTokenAuthentication
+from apps.interface_flows_api.conditional import versioned_get
+from apps.interface_flows_api.exceptions import PrivateFlowException
+from apps.interface_flows_api.pagination import (CursorPaginationMixin,
+                                                 FlowsPagination)
+from apps.interface_flows_api.selectors.catalog_selector import (
+    genre_catalog, platform_catalog)
+from apps.interface_flows_api.selectors.flow_selector import flow_selector
+from apps.interface_flows_api.serializers import (FlowSerializer,
+                                                  FlowSimpleSerializer,
+                                                  FlowSocialSerializer,
+                                                  GenreSerializer,
+                                                  PlatformSerializer)
+from apps.interface_flows_api.services.flow_cache_service import \
+    flow_cache_service
+from apps.interface_flows_api.services.version_service import version_service
+from apps.interface_flows_api.views import (FlowDetailView, FlowView,
+                                            GenresView, LikedFlowView,
+                                            MyFlowView, PlatformsView,
+                                            get_flow_detail_versions,
+                                            get_flows_versions)
+
+
+class AsyncReadView(View):
+    """
+    Async GET of a read endpoint for ASGI deployments.
+    GET authenticates the token and queries the database with the async ORM, so a
+    worker serves other requests while waiting on the database. Other methods are
+    handled by `sync_view`, the DRF view of the same endpoint.
+    """
+
+    sync_view: Type[APIView] = None
+    authentication_required = False
+    renderer = JSONRenderer()
+    _sync_view_func = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # authentication is by token, as in DRF views
+        view.csrf_exempt = True
+        return view
+
+    @classmethod
+    def get_sync_view_func(cls):
+        if cls.__dict__.get("_sync_view_func") is None:
+            view_func = sync_to_async(cls.sync_view.as_view())
+            cls._sync_view_func = staticmethod(view_func)
+        return cls._sync_view_func
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method != "GET":
+            return await self.get_sync_view_func()(request, *args, **kwargs)
+
+        request = Request(request)
+        self.request = request
+        try:
+            request.user = await self.authenticate(request)
+            if self.authentication_required and not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            return await self.get(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    @staticmethod
+    async def authenticate(request) -> User:
+        """CachedTokenAuthentication with the async ORM on a cache miss."""
+        auth = get_authorization_header(request).split()
+        keyword = CachedTokenAuthentication.keyword.lower().encode()
+        if not auth or auth[0].lower() != keyword:
+            return AnonymousUser()
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid token.")
+        user, _ = await CachedTokenAuthentication().aauthenticate_credentials(key)
+        return user
+
+    @staticmethod
+    def in_thread(func):
+        """Blocking cache calls run in worker threads not to stall the event loop."""
+        return sync_to_async(func, thread_sensitive=False)
+
+    def render(self, data, status: int = 200) -> HttpResponse:
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status,
+            content_type=self.renderer.media_type,
+        )
+
+    def handle_exception(self, exc: exceptions.APIException) -> HttpResponse:
+        """Same responses as APIView.handle_exception for token authenticated views."""
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        response = self.render(data, status=exc.status_code)
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            response.headers["WWW-Authenticate"] = CachedTokenAuthentication.keyword
+        return response
+
+
+class AsyncListView(CursorPaginationMixin, AsyncReadView):
+    """
+    Listing of flows, paginated like the DRF view of the endpoint. Subclasses define
+    the flows listed by `async def aget_queryset(self, request)`.
+    """
+
+    pagination_class = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not inspect.iscoroutinefunction(getattr(cls, "aget_queryset", None)):
+            raise TypeError(f"{cls.__name__} has to define async aget_queryset")
+
+    async def get(self, request, *args, **kwargs):
+        flows = await self.aget_queryset(request)
+        paginator = self.paginator
+        if paginator is None:
+            page = [flow async for flow in flows]
+        else:
+            page = await paginator.apaginate_queryset(flows, request, view=self)
+        data = FlowSimpleSerializer(page, many=True, context={"request": request}).data
+        if paginator is None:
+            return self.render(data)
+        return self.render(paginator.get_paginated_response(data).data)
+
+
+@versioned_get(get_flows_versions, per_user=True)
+class AsyncFlowView(AsyncListView):
+    """Async controller to list public flows, flows are created by FlowView."""
+
+    sync_view = FlowView
+    pagination_class = FlowsPagination
+
+    async def aget_queryset(self, request):
+        # genres and platforms are resolved from their catalogs, which may reload
+        return await sync_to_async(FlowView.get_public_flows)(request)
+
+
+@versioned_get(get_flows_versions, per_user=True)
+class AsyncMyFlowView(AsyncListView):
+    """Async controller to get flows created by a user."""
+
+    sync_view = MyFlowView
+    authentication_required = True
+
+    async def aget_queryset(self, request):
+        return flow_selector.get_my_flows(request.user)
+
+
+@versioned_get(get_flows_versions, per_user=True)
+class AsyncLikedFlowView(AsyncListView):
+    """Async controller to get flows liked by a user."""
+
+    sync_view = LikedFlowView
+    authentication_required = True
+
+    async def aget_queryset(self, request):
+        return flow_selector.get_liked_flows(request.user)
+
+
+@versioned_get(get_flow_detail_versions, per_user=True)
+class AsyncFlowDetailView(AsyncReadView):
+    """Async controller to retrieve a detailed flow."""
+
+    sync_view = FlowDetailView
+
+    @staticmethod
+    def get_cached_parts(
+        pk: int,
+    ) -> Tuple[Optional[Dict[str, int]], Dict[str, dict]]:
+        versions = flow_cache_service.get_versions(pk, start_missing=False)
+        if versions is None:
+            return None, {}
+        return versions, flow_cache_service.get_parts(pk, versions)
+
+    async def get(self, request, pk: int, *args, **kwargs):
+        versions, parts = await self.in_thread(self.get_cached_parts)(pk)
+        if flow_cache_service.GRAPH in parts:
+            if flow_cache_service.SOCIAL not in parts:
+                flow = await flow_selector.aget_flow_social(pk)
+                social = FlowSocialSerializer(flow, context={"request": request}).data
+                parts[flow_cache_service.SOCIAL] = social
+                await self.in_thread(flow_cache_service.set_parts)(
+                    pk, {flow_cache_service.SOCIAL: social}, versions
+                )
+            data = {
+                **parts[flow_cache_service.GRAPH],
+                **parts[flow_cache_service.SOCIAL],
+            }
+            data["is_liked"] = await flow_cache_service.aget_is_liked(pk, request.user)
+            return self.render(data)
+
+        try:
+            flow = await flow_selector.aget_flow_detail(flow_id=pk, user=request.user)
+        except ObjectDoesNotExist:
+            raise exceptions.NotFound(detail=f"Flow with id={pk} not found.", code=404)
+        except PrivateFlowException:
+            raise exceptions.PermissionDenied(
+                detail="Access to the flow is denied.", code=403
+            )
+        data = FlowSerializer(flow, context={"request": request}).data
+        if flow_cache_service.is_cacheable(flow):
+            if versions is None:
+                await self.in_thread(flow_cache_service.get_versions)(pk)
+            else:
+                await self.in_thread(flow_cache_service.set_detail)(pk, data, versions)
+        return self.render(data)
+
+
+@versioned_get(lambda request: [version_service.get(version_service.GENRES)])
+class AsyncGenresView(AsyncReadView):
+    """Async controller to retrieve all genres"""
+
+    sync_view = GenresView
+
+    async def get(self, request, *args, **kwargs):
+        data = await genre_catalog.aget_rendered(
+            "list",
+            lambda genres: GenreSerializer(
+                genres, many=True, context={"request": request}
+            ).data,
+        )
+        return self.render(data)
+
+
+@versioned_get(lambda request: [version_service.get(version_service.PLATFORMS)])
+class AsyncPlatformsView(AsyncReadView):
+    """Async controller to retrieve all platforms"""
+
+    sync_view = PlatformsView
+
+    async def get(self, request, *args, **kwargs):
+        data = await platform_catalog.aget_rendered(
+            "list",
+            lambda platforms: PlatformSerializer(
+                platforms, many=True, context={"request": request}
+            ).data,
+        )
+        return self.render(data)
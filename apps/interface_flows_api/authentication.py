@@ -0,0 +1,54 @@
+from typing import Tuple
+
+from asgiref.sync import sync_to_async
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from apps.interface_flows_api.models import User
+from apps.interface_flows_api.services.token_cache_service import \
+    token_cache_service
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication resolving tokens through TokenCacheService, so authenticating
+    and reading the profile id of the user run no query on a cache hit.
+    `request.auth` is an unsaved token with the key and the user.
+    """
+
+    def _get_token_queryset(self):
+        return self.get_model().objects.select_related("user__profile")
+
+    def _authenticated(self, key: str, user: User) -> Tuple[User, object]:
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return user, self.get_model()(key=key, user=user)
+
+    def authenticate_credentials(self, key: str) -> Tuple[User, object]:
+        user, version = token_cache_service.get(key)
+        if user is None:
+            try:
+                user = self._get_token_queryset().get(key=key).user
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            token_cache_service.set(key, user, version)
+        return self._authenticated(key, user)
+
+    async def aauthenticate_credentials(self, key: str) -> Tuple[User, object]:
+        """
+        authenticate_credentials for async views. The blocking cache calls run in
+        worker threads, they need no connection bound to the request thread.
+        """
+        user, version = await sync_to_async(
+            token_cache_service.get, thread_sensitive=False
+        )(key)
+        if user is None:
+            try:
+                user = (await self._get_token_queryset().aget(key=key)).user
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            await sync_to_async(token_cache_service.set, thread_sensitive=False)(
+                key, user, version
+            )
+        return self._authenticated(key, user)
@@ -0,0 +1,104 @@
+import asyncio
+from calendar import timegm
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+
+VersionsGetter = Callable[..., Optional[Iterable[int]]]
+
+
+def async_condition(etag_func: Callable, last_modified_func: Callable):
+    """django.views.decorators.http.condition for async view methods."""
+
+    def decorator(method):
+        @wraps(method)
+        async def inner(self, request, *args, **kwargs):
+            etag = etag_func(request, *args, **kwargs)
+            etag = None if etag is None else quote_etag(etag)
+            last_modified = last_modified_func(request, *args, **kwargs)
+            if last_modified is not None:
+                last_modified = timegm(last_modified.utctimetuple())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await method(self, request, *args, **kwargs)
+            if last_modified and not response.has_header("Last-Modified"):
+                response.headers["Last-Modified"] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault("ETag", etag)
+            return response
+
+        return inner
+
+    return decorator
+
+
+def versioned_get(get_versions: VersionsGetter, per_user: bool = False):
+    """
+    Class decorator adding ETag and Last-Modified validators to GET of a view.
+    Validators are built from the version stamps returned by `get_versions(request, **kwargs)`,
+    so a matching If-None-Match or If-Modified-Since is answered with 304 before
+    any queryset or serializer runs. Responses get no validators when it returns None.
+    `per_user` views also vary on the requesting user.
+    """
+
+    def versions(request, *args, **kwargs) -> Optional[list]:
+        if not hasattr(request, "_versions"):
+            request_versions = get_versions(request, *args, **kwargs)
+            if request_versions is not None:
+                request_versions = list(request_versions)
+            request._versions = request_versions
+        return request._versions
+
+    def etag(request, *args, **kwargs) -> Optional[str]:
+        request_versions = versions(request, *args, **kwargs)
+        if request_versions is None:
+            return None
+        tag = "-".join(str(version) for version in request_versions)
+        if per_user:
+            tag = f"{tag}-{request.user.id or 0}"
+        return tag
+
+    def last_modified(request, *args, **kwargs) -> Optional[datetime]:
+        request_versions = versions(request, *args, **kwargs)
+        if request_versions is None:
+            return None
+        return datetime.fromtimestamp(max(request_versions) / 1e9, tz=timezone.utc)
+
+    def decorate_async(view_class):
+        get = async_condition(etag_func=etag, last_modified_func=last_modified)(
+            view_class.get
+        )
+
+        @wraps(get)
+        async def get_versioned(self, request, *args, **kwargs):
+            # versions are read off the event loop, the validators then reuse them
+            await sync_to_async(versions, thread_sensitive=False)(
+                request, *args, **kwargs
+            )
+            response = await get(self, request, *args, **kwargs)
+            if per_user:
+                patch_vary_headers(response, ("Authorization",))
+            return response
+
+        view_class.get = get_versioned
+        return view_class
+
+    decorators = [condition(etag_func=etag, last_modified_func=last_modified)]
+    if per_user:
+        decorators.insert(0, vary_on_headers("Authorization"))
+
+    def decorator(view_class):
+        if asyncio.iscoroutinefunction(view_class.get):
+            return decorate_async(view_class)
+        return method_decorator(decorators, name="get")(view_class)
+
+    return decorator
@@ -1,10 +1,56 @@
+import os
+
 # AWS FOLDERS
 AWS_FOLDER_SCREENS = "screens/"
 AWS_FOLDER_PROFILES = "profiles/"
 AWS_FOLDER_THUMBNAILS = "flows/"
 AWS_FOLDER_ICONS = "icons/"
+# LOCAL FOLDERS
+JOBS_FOLDER_VIDEOS = "jobs/videos/"
+JOBS_FOLDER_THUMBNAILS = "jobs/thumbnails/"
 # AWS DEFAULTS
 DEFAULT_SCREEN = "screen.jpg"
 DEFAULT_PROFILE = "profile.png"
 DEFAULT_THUMBNAIL = "thumbnail.png"
 DEFAULT_ICON = "icon.png"
+# THUMBNAILS
+THUMBNAIL_SIZES = tuple(
+    int(size) for size in os.getenv("THUMBNAIL_SIZES", "160,320,640").split(",")
+)
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", 80))
+# FRAMES
+FRAME_STORE_SPILL_BYTES = int(os.getenv("FRAME_STORE_SPILL_MB", 512)) * 1024 * 1024
+SCREEN_MAX_WIDTH = int(os.getenv("SCREEN_MAX_WIDTH", 0)) or None
+ML_FRAME_WIDTH = int(os.getenv("ML_FRAME_WIDTH", 0)) or None
+FRAME_DEDUP_THRESHOLD = int(os.getenv("FRAME_DEDUP_THRESHOLD", 5))
+FRAME_ENCODE_BATCH_SIZE = int(os.getenv("FRAME_ENCODE_BATCH_SIZE", 32))
+FRAME_ENCODED_CACHE_BYTES = int(os.getenv("FRAME_ENCODED_CACHE_MB", 64)) * 1024 * 1024
+SCREEN_PREVIEW_WIDTH = int(os.getenv("SCREEN_PREVIEW_WIDTH", 160))
+ENCODER_WORKERS = int(os.getenv("ENCODER_WORKERS", 0)) or os.cpu_count()
+# ML SERVICE
+ML_SERVICE_HOST = os.getenv("ML_SERVICE_HOST")
+ML_SERVICE_PORT = os.getenv("ML_SERVICE_PORT")
+ML_SERVICE_TRANSPORT = os.getenv("ML_SERVICE_TRANSPORT", "json")
+ML_SERVICE_BATCH_SIZE = int(os.getenv("ML_SERVICE_BATCH_SIZE", 64))
+ML_SERVICE_CONNECT_TIMEOUT = float(os.getenv("ML_SERVICE_CONNECT_TIMEOUT", 3))
+ML_SERVICE_READ_TIMEOUT = float(os.getenv("ML_SERVICE_READ_TIMEOUT", 300))
+ML_SERVICE_RETRIES = int(os.getenv("ML_SERVICE_RETRIES", 2))
+ML_SERVICE_FAILURE_THRESHOLD = int(os.getenv("ML_SERVICE_FAILURE_THRESHOLD", 5))
+ML_SERVICE_RECOVERY_TIMEOUT = float(os.getenv("ML_SERVICE_RECOVERY_TIMEOUT", 30))
+# UPLOADS
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 16))
+# BUILD JOBS
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", 2))
+JOBS_HEARTBEAT_INTERVAL = float(os.getenv("JOBS_HEARTBEAT_INTERVAL", 30))
+JOBS_STALE_AFTER = int(os.getenv("JOBS_STALE_AFTER", 5 * 60))
+# POPULARITY
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", 0))
+# CACHE
+FLOW_CACHE_TIMEOUT = int(os.getenv("FLOW_CACHE_TIMEOUT", 24 * 60 * 60))
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", 60))
+# ASGI
+ASYNC_READ_VIEWS = bool(int(os.getenv("ASYNC_READ_VIEWS", 0)))
+# AUTHENTICATION
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 30))
+AUTH_CACHE_TIMEOUT = int(os.getenv("AUTH_CACHE_TIMEOUT", 60 * 60))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.interface_flows_api.services.flow_build_service import \
+    flow_build_service
+
+
+class Command(BaseCommand):
+    help = "Build downscaled image levels of screens stored without them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of screens processed at once.",
+        )
+
+    def handle(self, *args, **options):
+        updated = flow_build_service.add_missing_screen_levels(
+            batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Built levels of {updated} screens."))
@@ -0,0 +1,45 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.interface_flows_api.services.auth_service import auth_service
+
+
+class Command(BaseCommand):
+    help = "Create users with their profiles and tokens from a CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help="CSV file with a header of username, email and password columns.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of users inserted at once.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="Number of processes hashing passwords, all CPUs by default.",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["path"], newline="") as file:
+            reader = csv.DictReader(file)
+            missing = {"username", "password"} - set(reader.fieldnames or ())
+            if missing:
+                raise CommandError(f"Missing columns: {', '.join(sorted(missing))}")
+            result = auth_service.bulk_create_users(
+                reader,
+                batch_size=options["batch_size"],
+                processes=options["processes"],
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result['created']} users, "
+                f"skipped {result['skipped']} existing ones."
+            )
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.interface_flows_api.services.flow_counter_service import \
+    flow_counter_service
+
+
+class Command(BaseCommand):
+    help = "Recount likes, screens and comments stored on flows."
+
+    def handle(self, *args, **options):
+        repaired = flow_counter_service.reconcile()
+        for counter, flows in repaired.items():
+            self.stdout.write(f"{counter}: repaired {flows} flows")
+        self.stdout.write(self.style.SUCCESS("Flow counters are reconciled."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.interface_flows_api.services.flow_job_service import flow_job_service
+
+
+class Command(BaseCommand):
+    help = "Process queued flow build jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Number of worker processes in the local pool.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling for new jobs.",
+        )
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        burst = options["burst"]
+        if processes > 1:
+            processed = flow_job_service.run_worker_pool(processes, burst=burst)
+        else:
+            processed = flow_job_service.run_worker(burst=burst)
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} build jobs."))
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import apps.interface_flows_api.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interface_flows_api", "0002_alter_flow_flow_thumbnail_url"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FlowBuildJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("QD", "Queued"),
+                            ("RN", "Running"),
+                            ("DN", "Done"),
+                            ("FL", "Failed"),
+                        ],
+                        db_index=True,
+                        default="QD",
+                        max_length=2,
+                    ),
+                ),
+                (
+                    "stage",
+                    models.CharField(
+                        choices=[
+                            ("uploaded", "Uploaded"),
+                            ("extracting", "Extracting frames"),
+                            ("recognizing", "Recognizing screens"),
+                            ("saving", "Saving screens"),
+                            ("layout", "Building layout"),
+                            ("finished", "Finished"),
+                        ],
+                        default="uploaded",
+                        max_length=16,
+                    ),
+                ),
+                ("progress", models.IntegerField(default=0)),
+                (
+                    "video",
+                    models.FileField(
+                        storage=apps.interface_flows_api.models.get_jobs_storage,
+                        upload_to="jobs/videos/",
+                    ),
+                ),
+                (
+                    "thumbnail",
+                    models.FileField(
+                        blank=True,
+                        null=True,
+                        storage=apps.interface_flows_api.models.get_jobs_storage,
+                        upload_to="jobs/thumbnails/",
+                    ),
+                ),
+                ("parameters", models.JSONField(blank=True, default=dict)),
+                ("error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="build_jobs",
+                        to="interface_flows_api.profile",
+                    ),
+                ),
+                (
+                    "flow",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="build_jobs",
+                        to="interface_flows_api.flow",
+                    ),
+                ),
+            ],
+        ),
+    ]
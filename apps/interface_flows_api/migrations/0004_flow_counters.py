@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_flow_relations(apps, schema_editor):
+    Flow = apps.get_model("interface_flows_api", "Flow")
+    counted_models = {
+        "likes_count": apps.get_model("interface_flows_api", "Like"),
+        "screens_count": apps.get_model("interface_flows_api", "Screen"),
+        "comments_count": apps.get_model("interface_flows_api", "Comment"),
+    }
+    for counter, model in counted_models.items():
+        count = (
+            model.objects.filter(flow=OuterRef("pk"))
+            .order_by()
+            .values("flow")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        Flow.objects.update(
+            **{
+                counter: Coalesce(
+                    Subquery(count, output_field=models.IntegerField()), Value(0)
+                )
+            }
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interface_flows_api", "0003_flowbuildjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flow",
+            name="comments_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="flow",
+            name="likes_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="flow",
+            name="screens_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_flow_relations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:56
+
+import math
+import os
+from datetime import date
+
+from django.db import migrations, models
+
+# utils.popularity.compute_popularity at the time of this migration
+POPULARITY_EPOCH = date(2024, 1, 1)
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", 0))
+
+
+def compute_popularity(likes: int, created: date) -> float:
+    if not POPULARITY_HALF_LIFE_DAYS:
+        return float(likes)
+    age_bonus = (created - POPULARITY_EPOCH).days / POPULARITY_HALF_LIFE_DAYS
+    return math.log2(max(likes, 1)) + age_bonus
+
+
+def compute_flows_popularity(apps, schema_editor):
+    Flow = apps.get_model("interface_flows_api", "Flow")
+    flows = list(Flow.objects.only("id", "likes_count", "date"))
+    for flow in flows:
+        flow.popularity = compute_popularity(flow.likes_count, flow.date)
+    Flow.objects.bulk_update(flows, ["popularity"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interface_flows_api", "0004_flow_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flow",
+            name="popularity",
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(compute_flows_popularity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="flow",
+            index=models.Index(
+                fields=["visibility", "status", "-popularity", "-id"],
+                name="flow_public_popularity_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="flow",
+            index=models.Index(
+                fields=["visibility", "status", "-date", "-id"],
+                name="flow_public_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="flow",
+            index=models.Index(
+                fields=["visibility", "status", "title", "id"],
+                name="flow_public_title_idx",
+            ),
+        ),
+    ]
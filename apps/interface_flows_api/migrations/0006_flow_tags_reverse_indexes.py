@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    The implicit through tables only have a (flow_id, tag_id) unique index and an index
+    on each column, tag filters also need the reverse composite index to find flows of
+    a tag with an index only scan.
+    """
+
+    dependencies = [
+        ("interface_flows_api", "0005_flow_popularity"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX flow_genres_genre_flow_idx "
+            "ON interface_flows_api_flow_genres (genre_id, flow_id);",
+            "DROP INDEX flow_genres_genre_flow_idx;",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX flow_platforms_platform_flow_idx "
+            "ON interface_flows_api_flow_platforms (platform_id, flow_id);",
+            "DROP INDEX flow_platforms_platform_flow_idx;",
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:42
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE FUNCTION flow_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.source, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER flow_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON interface_flows_api_flow
+    FOR EACH ROW EXECUTE FUNCTION flow_search_vector_update();
+
+UPDATE interface_flows_api_flow SET title = title;
+
+CREATE INDEX flow_search_vector_idx
+    ON interface_flows_api_flow USING gin (search_vector);
+CREATE INDEX flow_title_trgm_idx
+    ON interface_flows_api_flow USING gin (title gin_trgm_ops);
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP INDEX IF EXISTS flow_title_trgm_idx;
+DROP INDEX IF EXISTS flow_search_vector_idx;
+DROP TRIGGER IF EXISTS flow_search_vector_trigger ON interface_flows_api_flow;
+DROP FUNCTION IF EXISTS flow_search_vector_update();
+"""
+
+
+def run_on_postgresql(sql: str):
+    """Full-text search is PostgreSQL only, other databases use the in-memory index."""
+
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interface_flows_api", "0006_flow_tags_reverse_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flow",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(SEARCH_VECTOR_SQL),
+            run_on_postgresql(DROP_SEARCH_VECTOR_SQL),
+        ),
+    ]
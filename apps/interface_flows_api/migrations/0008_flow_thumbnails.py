@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interface_flows_api", "0007_flow_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flow",
+            name="thumbnails",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
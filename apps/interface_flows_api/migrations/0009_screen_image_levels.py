@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interface_flows_api", "0008_flow_thumbnails"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="screen",
+            name="image_levels",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
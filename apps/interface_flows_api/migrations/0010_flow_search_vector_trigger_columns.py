@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:40
+
+from django.db import migrations
+
+TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS flow_search_vector_trigger ON interface_flows_api_flow;
+CREATE TRIGGER flow_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF {columns} ON interface_flows_api_flow
+    FOR EACH ROW EXECUTE FUNCTION flow_search_vector_update();
+"""
+
+
+def run_on_postgresql(sql: str):
+    """Full-text search is PostgreSQL only, other databases use the in-memory index."""
+
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(sql)
+
+    return run
+
+
+# counter and popularity updates do not recompute the search vector
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interface_flows_api", "0009_screen_image_levels"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(TRIGGER_SQL.format(columns="title, source")),
+            run_on_postgresql(TRIGGER_SQL.replace(" OF {columns}", "")),
+        ),
+    ]
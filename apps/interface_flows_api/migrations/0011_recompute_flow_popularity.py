@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:05
+
+import math
+import os
+from datetime import date
+
+from django.db import migrations
+
+# utils.popularity.compute_popularity at the time of this migration, which counts
+# likes + 1 so a flow without likes no longer ranks as high as one with a single like
+POPULARITY_EPOCH = date(2024, 1, 1)
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", 0))
+
+
+def compute_popularity(likes: int, created: date) -> float:
+    if not POPULARITY_HALF_LIFE_DAYS:
+        return float(likes)
+    age_bonus = (created - POPULARITY_EPOCH).days / POPULARITY_HALF_LIFE_DAYS
+    return math.log2(likes + 1) + age_bonus
+
+
+def recompute_flows_popularity(apps, schema_editor):
+    Flow = apps.get_model("interface_flows_api", "Flow")
+    flows = list(Flow.objects.only("id", "likes_count", "date"))
+    for flow in flows:
+        flow.popularity = compute_popularity(flow.likes_count, flow.date)
+    Flow.objects.bulk_update(flows, ["popularity"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interface_flows_api", "0010_flow_search_vector_trigger_columns"),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_flows_popularity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interface_flows_api", "0011_recompute_flow_popularity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flowbuildjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
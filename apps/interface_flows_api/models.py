@@ -1,8 +1,12 @@
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
+from django.core.files.storage import FileSystemStorage
 from django.db import models
-from django.db.models import (BooleanField, CharField, DateField, ForeignKey,
-                              ImageField, IntegerField, ManyToManyField, Max,
-                              Model, OneToOneField, TextChoices, TextField)
+from django.db.models import (BooleanField, CharField, DateField,
+                              DateTimeField, FileField, FloatField, ForeignKey,
+                              ImageField, Index, IntegerField, JSONField,
+                              ManyToManyField, Max, Model, OneToOneField,
+                              TextChoices, TextField)
 from django.utils.translation import gettext_lazy as _
 
 import apps.interface_flows_api.config as config
@@ -98,6 +102,8 @@ class Flow(Model):
         upload_to=config.AWS_FOLDER_THUMBNAILS,
         blank=True,
     )
+    # storage names of thumbnail derivatives by format and size
+    thumbnails = JSONField(default=dict, blank=True)
     genres = ManyToManyField(Genre, related_name="genres", blank=True)
     platforms = ManyToManyField(Platform, related_name="platforms", blank=True)
     screens_properties = ForeignKey(
@@ -107,30 +113,55 @@ class Flow(Model):
         blank=True,
         related_name="flows_visual_properties",
     )
+    likes_count = IntegerField(default=0)
+    screens_count = IntegerField(default=0)
+    comments_count = IntegerField(default=0)
+    popularity = FloatField(default=0)
+    # maintained by a trigger on PostgreSQL, see migration 0007
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            Index(
+                fields=["visibility", "status", "-popularity", "-id"],
+                name="flow_public_popularity_idx",
+            ),
+            Index(
+                fields=["visibility", "status", "-date", "-id"],
+                name="flow_public_date_idx",
+            ),
+            Index(
+                fields=["visibility", "status", "title", "id"],
+                name="flow_public_title_idx",
+            ),
+        ]
 
     @property
     def total_likes(self) -> int:
-        return len(Like.objects.filter(flow=self))
+        return self.likes_count
 
     @property
     def total_screens(self) -> int:
-        return len(Screen.objects.filter(flow=self))
+        return self.screens_count
 
     @property
     def average_connectivity(self) -> int:
         return 0
 
+    def _max_screen_position(self, field: str) -> int:
+        if "screens" in getattr(self, "_prefetched_objects_cache", {}):
+            return max(
+                (getattr(screen, field) for screen in self.screens.all()), default=None
+            )
+        return Screen.objects.filter(flow=self).aggregate(Max(field))[f"{field}__max"]
+
     @property
     def max_x(self) -> int:
-        return Screen.objects.filter(flow=self).aggregate(Max("position_x"))[
-            "position_x__max"
-        ]
+        return self._max_screen_position("position_x")
 
     @property
     def max_y(self) -> int:
-        return Screen.objects.filter(flow=self).aggregate(Max("position_y"))[
-            "position_y__max"
-        ]
+        return self._max_screen_position("position_y")
 
     def __str__(self):
         return f"{self.title} ({self.id})"
@@ -145,6 +176,8 @@ class Screen(Model):
         upload_to=config.AWS_FOLDER_SCREENS,
         default=f"{config.AWS_FOLDER_SCREENS}/{config.DEFAULT_SCREEN}",
     )
+    # storage names of downscaled images by level, see utils/pyramid.py
+    image_levels = JSONField(default=dict, blank=True)
     position_x = IntegerField(default=0)
     position_y = IntegerField(default=0)
 
@@ -220,3 +253,63 @@ class Like(Model):
             "user",
             "flow",
         )
+
+
+def get_jobs_storage() -> FileSystemStorage:
+    """Uploads waiting for a build worker are kept locally under MEDIA_ROOT."""
+    return FileSystemStorage()
+
+
+class FlowBuildJobStatus(TextChoices):
+    QUEUED = "QD", _("Queued")
+    RUNNING = "RN", _("Running")
+    DONE = "DN", _("Done")
+    FAILED = "FL", _("Failed")
+
+
+class FlowBuildStage(TextChoices):
+    UPLOADED = "uploaded", _("Uploaded")
+    EXTRACTING = "extracting", _("Extracting frames")
+    RECOGNIZING = "recognizing", _("Recognizing screens")
+    SAVING = "saving", _("Saving screens")
+    LAYOUT = "layout", _("Building layout")
+    FINISHED = "finished", _("Finished")
+
+
+class FlowBuildJob(Model):
+    author = ForeignKey(
+        Profile, on_delete=models.CASCADE, null=False, related_name="build_jobs"
+    )
+    status = CharField(
+        max_length=2,
+        choices=FlowBuildJobStatus.choices,
+        default=FlowBuildJobStatus.QUEUED,
+        db_index=True,
+    )
+    stage = CharField(
+        max_length=16, choices=FlowBuildStage.choices, default=FlowBuildStage.UPLOADED
+    )
+    progress = IntegerField(default=0)
+    video = FileField(upload_to=config.JOBS_FOLDER_VIDEOS, storage=get_jobs_storage)
+    thumbnail = FileField(
+        upload_to=config.JOBS_FOLDER_THUMBNAILS,
+        storage=get_jobs_storage,
+        null=True,
+        blank=True,
+    )
+    parameters = JSONField(default=dict, blank=True)
+    flow = ForeignKey(
+        Flow,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="build_jobs",
+    )
+    error = TextField(blank=True, default="")
+    created_at = DateTimeField(auto_now_add=True)
+    updated_at = DateTimeField(auto_now=True)
+    # refreshed by the worker while the job runs, see FlowJobService
+    heartbeat_at = DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Build job {self.id} ({self.get_status_display()})"
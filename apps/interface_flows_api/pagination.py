@@ -0,0 +1,270 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from typing import Any, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Field, Func, Q, QuerySet, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class RowValue(Func):
+    """SQL row value `(a, b, ...)`, compared lexicographically by the database."""
+
+    template = "(%(expressions)s)"
+    arg_joiner = ", "
+    output_field = Field()
+
+
+class FlowsPagination(PageNumberPagination):
+    """Simple flows pagination for listing."""
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 10
+
+    async def apaginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        """paginate_queryset for async views, the count and the page use the async ORM."""
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+            raise NotFound(msg)
+        self.page.object_list = [row async for row in self.page.object_list]
+        self.request = request
+        return list(self.page)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over the ordering of the queryset.
+    The cursor keeps the ordering values of the last returned row, so every page is a
+    seek on the ordering index instead of an OFFSET scan, and no COUNT runs unless an
+    approximate total is requested.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 10
+    cursor_query_param = "cursor"
+    total_query_param = "with_total"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self):
+        self.request = None
+        self.base_url = None
+        self.ordering = None
+        self.next_position = None
+        self.total = None
+
+    @staticmethod
+    def get_ordering(queryset: QuerySet) -> Tuple[QuerySet, List[Tuple[str, bool]]]:
+        """Ordering fields with their directions, `id` is added to make it unique."""
+        order_by = list(queryset.query.order_by)
+        fields = [field.lstrip("-") for field in order_by]
+        if "id" not in fields and "pk" not in fields:
+            descending = bool(order_by) and order_by[-1].startswith("-")
+            order_by.append("-id" if descending else "id")
+            queryset = queryset.order_by(*order_by)
+        ordering = [(field.lstrip("-"), field.startswith("-")) for field in order_by]
+        return queryset, ordering
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(ordering: List[Tuple[str, bool]], values: List[Any]) -> str:
+        data = {"fields": [field for field, _ in ordering], "values": values}
+        cursor = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+        return urlsafe_b64encode(cursor.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def get_ordering_field(queryset: QuerySet, field: str) -> Field:
+        annotations = queryset.query.annotations
+        if field in annotations:
+            return annotations[field].output_field
+        return queryset.model._meta.get_field(field)
+
+    def decode_cursor(
+        self, queryset: QuerySet, ordering: List[Tuple[str, bool]]
+    ) -> Optional[List[Any]]:
+        """Ordering values of the cursor converted to the types of their fields."""
+        cursor = self.request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            data = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            fields, values = data["fields"], data["values"]
+        except (BinasciiError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            fields != [field for field, _ in ordering]
+            or not isinstance(values, list)
+            or len(values) != len(fields)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [
+                self.get_ordering_field(queryset, field).to_python(value)
+                for field, value in zip(fields, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    @staticmethod
+    def get_position_filter(
+        queryset: QuerySet, ordering: List[Tuple[str, bool]], values: List[Any]
+    ) -> QuerySet:
+        """
+        Rows strictly after the position in the (field_1, ..., id) order.
+        A single row value comparison is used when all fields go in the same direction,
+        so the database seeks the composite ordering index directly.
+        """
+        directions = {descending for _, descending in ordering}
+        if len(directions) == 1:
+            lookup = "lt" if directions.pop() else "gt"
+            fields = [field for field, _ in ordering]
+            position = RowValue(*(F(field) for field in fields))
+            bound = RowValue(
+                *(
+                    Value(
+                        value,
+                        output_field=KeysetPagination.get_ordering_field(
+                            queryset, field
+                        ),
+                    )
+                    for field, value in zip(fields, values)
+                )
+            )
+            return queryset.alias(position=position).filter(
+                **{f"position__{lookup}": bound}
+            )
+
+        position_filter = Q()
+        for i, (field, descending) in enumerate(ordering):
+            lookup = "lt" if descending else "gt"
+            condition = Q(**{f"{field}__{lookup}": values[i]})
+            for j, (previous_field, _) in enumerate(ordering[:i]):
+                condition &= Q(**{previous_field: values[j]})
+            position_filter |= condition
+        return queryset.filter(position_filter)
+
+    @staticmethod
+    def get_approximate_total(queryset: QuerySet) -> int:
+        """Planner estimate on PostgreSQL, an exact count elsewhere."""
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return queryset.count()
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def _get_page_queryset(self, queryset: QuerySet, request) -> QuerySet:
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        queryset, self.ordering = self.get_ordering(queryset)
+        values = self.decode_cursor(queryset, self.ordering)
+        if values is None:
+            return queryset
+        return self.get_position_filter(queryset, self.ordering, values)
+
+    def _is_total_requested(self, request) -> bool:
+        return request.query_params.get(self.total_query_param) in ("1", "true")
+
+    def _get_page(self, rows: list, page_size: int) -> list:
+        """Page of `page_size + 1` fetched rows, the extra row only tells there is a next page."""
+        self.next_position = None
+        if len(rows) <= page_size:
+            return rows
+        page = rows[:page_size]
+        last = page[-1]
+        self.next_position = self.encode_cursor(
+            self.ordering, [getattr(last, field) for field, _ in self.ordering]
+        )
+        return page
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        if self._is_total_requested(request):
+            self.total = self.get_approximate_total(self.get_ordering(queryset)[0])
+        page_queryset = self._get_page_queryset(queryset, request)
+        page_size = self.get_page_size(request)
+        return self._get_page(list(page_queryset[: page_size + 1]), page_size)
+
+    async def apaginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        if self._is_total_requested(request):
+            self.total = await sync_to_async(self.get_approximate_total)(
+                self.get_ordering(queryset)[0]
+            )
+        page_queryset = self._get_page_queryset(queryset, request)
+        page_size = self.get_page_size(request)
+        rows = [row async for row in page_queryset[: page_size + 1]]
+        return self._get_page(rows, page_size)
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.next_position
+        )
+
+    def get_paginated_response(self, data) -> Response:
+        response = {"next": self.get_next_link(), "results": data}
+        if self.total is not None:
+            response["count"] = self.total
+        return Response(response)
+
+
+class FlowsCursorPagination(KeysetPagination):
+    """Cursor flows pagination for listing."""
+
+    page_size = 10
+    max_page_size = 10
+
+
+class CursorPaginationMixin:
+    """Views switch to cursor pagination when a client asks for it with `pagination=cursor`."""
+
+    cursor_pagination_class = FlowsCursorPagination
+    pagination_mode_query_param = "pagination"
+
+    def is_cursor_pagination(self) -> bool:
+        query_params = self.request.query_params
+        return (
+            query_params.get(self.pagination_mode_query_param) == "cursor"
+            or self.cursor_pagination_class.cursor_query_param in query_params
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.is_cursor_pagination():
+                self._paginator = self.cursor_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from asgiref.sync import sync_to_async
+from django.db.models import Model
+
+import apps.interface_flows_api.config as config
+from apps.interface_flows_api.models import Genre, Platform
+from apps.interface_flows_api.selectors.selector import SelectionOption
+from apps.interface_flows_api.services.version_service import version_service
+
+
+class CatalogSelector:
+    """
+    In-process snapshot of a small dictionary table such as genres or platforms.
+    Rows are kept together with the version of the table they were loaded at, and
+    are reloaded once the version is bumped by a change in any process, or after
+    `ttl` seconds.
+    """
+
+    def __init__(
+        self, model: Type[Model], version_name: str, ttl: float = config.CATALOG_TTL
+    ):
+        self.model = model
+        self.version_name = version_name
+        self.ttl = ttl
+        self._items: List[Model] = []
+        self._by_name: Dict[str, Model] = {}
+        self._rendered: Dict[str, Any] = {}
+        self._loaded_at: Optional[float] = None
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self, version: int) -> None:
+        with self._lock:
+            if self._is_fresh(version):
+                return
+            # the version is read before the rows, a change made in between is
+            # followed by a newer version and reloaded on the next call
+            items = list(self.model.objects.order_by("id"))
+            self._items = items
+            self._by_name = {item.name: item for item in items}
+            self._rendered = {}
+            self._loaded_at = time.monotonic()
+            self._version = version
+
+    def _is_fresh(self, version: int) -> bool:
+        return (
+            self._loaded_at is not None
+            and self._version == version
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    def get_all(self) -> List[Model]:
+        version = version_service.get(self.version_name)
+        if not self._is_fresh(version):
+            self._load(version)
+        return self._items
+
+    async def aget_all(self) -> List[Model]:
+        """get_all for async views, a reload runs in the thread of sync ORM calls."""
+        version = await sync_to_async(version_service.get)(self.version_name)
+        if not self._is_fresh(version):
+            await sync_to_async(self._load)(version)
+        return self._items
+
+    def get_items_by_names(
+        self, names: List[str] = None, option: SelectionOption = SelectionOption.all
+    ) -> List[Model]:
+        """Same selection as Selector.get_items_by_names, unknown names are skipped."""
+        items = self.get_all()
+        if names is None or len(names) == 0:
+            return items if option == SelectionOption.all else []
+        by_name = self._by_name
+        return [by_name[name] for name in dict.fromkeys(names) if name in by_name]
+
+    def get_rendered(self, key: str, render: Callable[[List[Model]], Any]) -> Any:
+        """Data derived from the rows, e.g. a serialized list, kept until the next reload."""
+        return self._render(self.get_all(), key, render)
+
+    async def aget_rendered(
+        self, key: str, render: Callable[[List[Model]], Any]
+    ) -> Any:
+        return self._render(await self.aget_all(), key, render)
+
+    def _render(
+        self, items: List[Model], key: str, render: Callable[[List[Model]], Any]
+    ) -> Any:
+        rendered = self._rendered
+        if self._items is not items:
+            # reloaded meanwhile, the cache belongs to the newer rows
+            return render(items)
+        if key not in rendered:
+            rendered[key] = render(items)
+        return rendered[key]
+
+
+genre_catalog = CatalogSelector(Genre, version_service.GENRES)
+platform_catalog = CatalogSelector(Platform, version_service.PLATFORMS)
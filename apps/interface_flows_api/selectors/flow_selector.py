@@ -1,61 +1,139 @@
-from typing import Iterable, List, Type
+from typing import Dict, Iterable, List, Tuple
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Model
+from django.db.models import Exists, OuterRef, Prefetch, QuerySet
 
 from apps.interface_flows_api.exceptions import PrivateFlowException
-from apps.interface_flows_api.models import (Connection, Flow, FlowStatus,
-                                             FlowVisibility, Genre, Platform,
-                                             Screen)
-from apps.interface_flows_api.selectors.selector import (SelectionOption,
-                                                         Selector,
-                                                         model_binder)
+from apps.interface_flows_api.models import (Comment, Connection, Flow,
+                                             FlowBuildJob, FlowStatus,
+                                             FlowVisibility, Genre, Like,
+                                             Platform, Screen)
+from apps.interface_flows_api.selectors.catalog_selector import (
+    genre_catalog, platform_catalog)
+from apps.interface_flows_api.selectors.selector import (MatchOption,
+                                                         SelectionOption,
+                                                         Selector)
 
 
 class FlowSelector(Selector):
     """Flow Selector is designed for read-only operations."""
 
     flows_on_verify_limit = 100
+    sort_fields = {"date": "date", "title": "title", "likes": "popularity"}
 
-    @model_binder(Genre)
+    @staticmethod
     def get_genres_by_names(
-        self,
-        model: Type[Model],
-        names: List[str] = None,
-        option: SelectionOption = SelectionOption.all,
-    ) -> Iterable[Genre]:
-        return self.get_items_by_names(model, names, option)
+        names: List[str] = None, option: SelectionOption = SelectionOption.all
+    ) -> List[Genre]:
+        return genre_catalog.get_items_by_names(names, option)
 
-    @model_binder(Platform)
+    @staticmethod
     def get_platforms_by_names(
-        self,
-        model: Type,
-        names: List[str] = None,
-        option: SelectionOption = SelectionOption.all,
-    ) -> Iterable[Platform]:
-        return self.get_items_by_names(model, names, option)
+        names: List[str] = None, option: SelectionOption = SelectionOption.all
+    ) -> List[Platform]:
+        return platform_catalog.get_items_by_names(names, option)
 
     @staticmethod
-    def get_flow_by_id(flow_id: int, user: User = None) -> Flow:
-        try:
-            flow = Flow.objects.get(id=flow_id)
-        except ObjectDoesNotExist:
-            raise ObjectDoesNotExist
+    def check_flow_access(flow: Flow, user: User = None) -> None:
         if (
             flow.visibility == FlowVisibility.PRIVATE
             or flow.status == FlowStatus.ON_MODERATION
-        ) and (user.id is None or user.profile != flow.author):
+        ) and (user.id is None or user.profile.id != flow.author_id):
             raise PrivateFlowException
+
+    def get_flow_by_id(self, flow_id: int, user: User = None) -> Flow:
+        try:
+            flow = Flow.objects.get(id=flow_id)
+        except ObjectDoesNotExist:
+            raise ObjectDoesNotExist
+        self.check_flow_access(flow, user)
         return flow
 
+    def _get_flow_detail_queryset(self, user: User = None) -> QuerySet:
+        flows = Flow.objects.select_related(
+            "author__user", "screens_properties"
+        ).prefetch_related(
+            "screens__connections_out",
+            Prefetch("comments", Comment.objects.select_related("author__user")),
+        )
+        return self.with_listing_data(flows, user)
+
+    @staticmethod
+    def _link_connection_screens(flow: Flow) -> Flow:
+        screens = {screen.id: screen for screen in flow.screens.all()}
+        for screen in screens.values():
+            for connection in screen.connections_out.all():
+                connection.screen_out = screen
+                connection.screen_in = screens[connection.screen_in_id]
+        return flow
+
+    def get_flow_detail(self, flow_id: int, user: User = None) -> Flow:
+        """
+        Flow with everything FlowSerializer renders loaded in a fixed number of queries:
+        the flow with its author, genres, platforms, screens, their connections and
+        comments with their authors. Connection screens are taken from the loaded screens.
+        """
+        try:
+            flow = self._get_flow_detail_queryset(user).get(id=flow_id)
+        except ObjectDoesNotExist:
+            raise ObjectDoesNotExist
+        self.check_flow_access(flow, user)
+        return self._link_connection_screens(flow)
+
+    async def aget_flow_detail(self, flow_id: int, user: User = None) -> Flow:
+        """get_flow_detail for async views, the user profile has to be loaded already."""
+        try:
+            flow = await self._get_flow_detail_queryset(user).aget(id=flow_id)
+        except ObjectDoesNotExist:
+            raise ObjectDoesNotExist
+        self.check_flow_access(flow, user)
+        return self._link_connection_screens(flow)
+
+    @staticmethod
+    def _get_flow_social_queryset() -> QuerySet:
+        return Flow.objects.only("id", "likes_count").prefetch_related(
+            Prefetch("comments", Comment.objects.select_related("author__user"))
+        )
+
+    def get_flow_social(self, flow_id: int) -> Flow:
+        """Flow with only what the social part of a detail renders: likes and comments."""
+        return self._get_flow_social_queryset().get(id=flow_id)
+
+    async def aget_flow_social(self, flow_id: int) -> Flow:
+        return await self._get_flow_social_queryset().aget(id=flow_id)
+
     @staticmethod
-    def get_my_flows(user: User) -> Iterable[Flow]:
-        return Flow.objects.filter(author=user.profile)
+    def get_build_job(job_id: int, user: User) -> FlowBuildJob:
+        return FlowBuildJob.objects.get(id=job_id, author=user.profile)
+
+    @staticmethod
+    def with_listing_data(flows: QuerySet, user: User = None) -> QuerySet:
+        """
+        Genres and platforms are prefetched and `is_liked` is annotated for an authenticated
+        user, so a page of flows is serialized without per-flow queries.
+        """
+        flows = flows.prefetch_related("genres", "platforms")
+        if user is None or not user.is_authenticated:
+            return flows
+        liked = Like.objects.filter(flow=OuterRef("pk"), user=user.profile)
+        return flows.annotate(is_liked=Exists(liked))
 
     @staticmethod
-    def get_liked_flows(user: User) -> Iterable[Flow]:
-        return Flow.objects.filter(liked_by__user=user.profile)
+    def is_liked_by(flow_id: int, user: User) -> bool:
+        return Like.objects.filter(flow_id=flow_id, user=user.profile).exists()
+
+    @staticmethod
+    async def ais_liked_by(flow_id: int, user: User) -> bool:
+        return await Like.objects.filter(flow_id=flow_id, user=user.profile).aexists()
+
+    def get_my_flows(self, user: User) -> Iterable[Flow]:
+        flows = Flow.objects.filter(author=user.profile).order_by("-date", "-id")
+        return self.with_listing_data(flows, user)
+
+    def get_liked_flows(self, user: User) -> Iterable[Flow]:
+        flows = Flow.objects.filter(likes__user=user.profile).order_by("-date", "-id")
+        return self.with_listing_data(flows, user)
 
     @staticmethod
     def get_flows_by_title(title: str) -> Iterable[Flow]:
@@ -71,46 +149,90 @@ class FlowSelector(Selector):
         )
         return True if len(flows) >= self.flows_on_verify_limit else False
 
+    @staticmethod
+    def has_tags(tags, tag_ids: List[int]) -> Exists:
+        """
+        Correlated EXISTS over a flow tags through table. Unlike a join it needs no
+        DISTINCT and is answered from the (flow_id, tag_id) index.
+        """
+        tag_field = tags.field.m2m_reverse_field_name()
+        links = tags.through.objects.filter(
+            flow_id=OuterRef("pk"), **{f"{tag_field}_id__in": tag_ids}
+        )
+        return Exists(links)
+
     def get_public_flows(
         self,
         sort: str = "date",
         order: str = "asc",
         genres: List[str] = None,
         platforms: List[str] = None,
+        user: User = None,
+        genre_match: str = MatchOption.any.value,
     ) -> Iterable[Flow]:
         """
         filter options: genres, platforms
+        genre match options: any or all of the genres
         sort options: date, title, likes
         order options: asc or desc
         """
+        flows = self.filter_public_flows(genres, platforms, genre_match)
+        sort_field = self.sort_fields.get(sort, self.sort_fields["date"])
+        flows = flows.order_by(
+            self.get_order_option(sort_field, order), self.get_order_option("id", order)
+        )
+        return self.with_listing_data(flows, user)
+
+    def filter_public_flows(
+        self,
+        genres: List[str] = None,
+        platforms: List[str] = None,
+        genre_match: str = MatchOption.any.value,
+    ) -> QuerySet:
+        """Public verified flows with the genres and platforms filters applied."""
         flows = Flow.objects.filter(
             visibility=FlowVisibility.PUBLIC, status=FlowStatus.VERIFIED
         )
         if genres:
-            genres = self.get_genres_by_names(genres)
-            flows = flows.filter(genres__in=genres).distinct()
+            genre_ids = [genre.id for genre in self.get_genres_by_names(genres)]
+            if genre_match == MatchOption.all.value:
+                if len(genre_ids) < len(set(genres)):
+                    return Flow.objects.none()
+                for genre_id in genre_ids:
+                    flows = flows.filter(self.has_tags(Flow.genres, [genre_id]))
+            else:
+                flows = flows.filter(self.has_tags(Flow.genres, genre_ids))
         if platforms:
-            platforms = self.get_platforms_by_names(platforms)
-            flows = flows.filter(platforms__in=platforms).distinct()
-        order_option = self.get_order_option(sort, order)
-        return flows.order_by(order_option)
+            platform_ids = [
+                platform.id for platform in self.get_platforms_by_names(platforms)
+            ]
+            flows = flows.filter(self.has_tags(Flow.platforms, platform_ids))
+        return flows
 
     @staticmethod
-    def get_connected_screens(screen: Screen) -> Iterable[Screen]:
-        direct_connections = Connection.objects.filter(screen_out=screen)
-        directed_connected = Screen.objects.filter(
-            connections_in__in=direct_connections
-        )
-
-        reverse_connections = Connection.objects.filter(
-            screen_in=screen, bidirectional=True
-        )
-
-        reverse_connected = Screen.objects.filter(
-            connections_out__in=reverse_connections
+    def get_flow_graph(flow: Flow) -> Tuple[List[Screen], Dict[int, List[int]]]:
+        """
+        Screens of a flow and their adjacency by screen id loaded in two queries.
+        Neighbours are the screens a screen leads to, followed by the screens
+        connected to it bidirectionally.
+        """
+        screens = list(Screen.objects.filter(flow=flow).order_by("flow_screen_number"))
+        connections = (
+            Connection.objects.filter(screen_out__flow=flow)
+            .order_by("id")
+            .values_list("screen_out_id", "screen_in_id", "bidirectional")
         )
-
-        return directed_connected.union(reverse_connected)
+        direct = {screen.id: [] for screen in screens}
+        reverse = {screen.id: [] for screen in screens}
+        for screen_out, screen_in, bidirectional in connections:
+            direct[screen_out].append(screen_in)
+            if bidirectional:
+                reverse[screen_in].append(screen_out)
+        graph = {
+            screen_id: list(dict.fromkeys(direct[screen_id] + reverse[screen_id]))
+            for screen_id in direct
+        }
+        return screens, graph
 
 
 flow_selector = FlowSelector()
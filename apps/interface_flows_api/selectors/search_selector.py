@@ -0,0 +1,84 @@
+import threading
+from typing import List, Optional
+
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, QuerySet, Value, When
+from django.db.models.functions import Cast
+
+from apps.interface_flows_api.models import Flow
+from apps.interface_flows_api.selectors.flow_selector import flow_selector
+from apps.interface_flows_api.selectors.selector import MatchOption, Selector
+from apps.interface_flows_api.services.version_service import version_service
+from apps.interface_flows_api.utils.search_index import InvertedIndex
+
+
+class FlowSearchSelector(Selector):
+    """
+    Search over flow titles and sources.
+    On PostgreSQL flows match the full-text query on their maintained search vector or
+    have a title similar to it by trigrams. Other databases use an in-memory inverted
+    index rebuilt whenever flows change.
+    """
+
+    search_config = "english"
+
+    def __init__(self):
+        self._index: Optional[InvertedIndex] = None
+        self._index_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def search_public_flows(
+        self,
+        query: str,
+        genres: List[str] = None,
+        platforms: List[str] = None,
+        genre_match: str = MatchOption.any.value,
+        user: User = None,
+    ) -> QuerySet:
+        """Public flows matching the query, the most relevant first, annotated with `rank`."""
+        flows = flow_selector.filter_public_flows(genres, platforms, genre_match)
+        if connections[flows.db].vendor == "postgresql":
+            flows = self._search_postgresql(flows, query)
+        else:
+            flows = self._search_in_memory(flows, query)
+        return flow_selector.with_listing_data(flows.order_by("-rank", "-id"), user)
+
+    def _search_postgresql(self, flows: QuerySet, query: str) -> QuerySet:
+        search_query = SearchQuery(
+            query, search_type="websearch", config=self.search_config
+        )
+        # real in PostgreSQL, cast to the double precision cursors compare with
+        rank = Cast(
+            SearchRank(F("search_vector"), search_query)
+            + TrigramSimilarity("title", query),
+            FloatField(),
+        )
+        return flows.filter(
+            Q(search_vector=search_query) | Q(title__trigram_similar=query)
+        ).annotate(rank=rank)
+
+    def _get_index(self) -> InvertedIndex:
+        version = version_service.get(version_service.FLOWS)
+        with self._lock:
+            if self._index_version != version:
+                documents = Flow.objects.values_list("id", "title", "source")
+                self._index = InvertedIndex(
+                    (flow_id, (title, source)) for flow_id, title, source in documents
+                )
+                self._index_version = version
+            return self._index
+
+    def _search_in_memory(self, flows: QuerySet, query: str) -> QuerySet:
+        ranks = self._get_index().search(query)
+        rank = Case(
+            *(When(id=flow_id, then=Value(value)) for flow_id, value in ranks.items()),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        return flows.filter(id__in=list(ranks)).annotate(rank=rank)
+
+
+flow_search_selector = FlowSearchSelector()
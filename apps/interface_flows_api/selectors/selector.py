@@ -15,6 +15,11 @@ class OrderOption(enum.Enum):
     descending = "desc"
 
 
+class MatchOption(enum.Enum):
+    any = "any"
+    all = "all"
+
+
 class Selector(ABC):
     """Selector is an abstract class which has common functions for filtering/sorting."""
 
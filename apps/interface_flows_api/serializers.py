@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
 from apps.interface_flows_api.models import *
+from apps.interface_flows_api.utils.pyramid import LEVELS
 
 
 class ProfileSerializer(ModelSerializer):
@@ -41,6 +42,7 @@ class ScreenVisualPropertiesSerializer(ModelSerializer):
 
 class ScreenSerializer(ModelSerializer):
     connections_out = ConnectionSerializer(read_only=True, many=True)
+    image_levels = serializers.SerializerMethodField()
 
     class Meta:
         model = Screen
@@ -48,11 +50,29 @@ class ScreenSerializer(ModelSerializer):
             "id",
             "flow_screen_number",
             "image",
+            "image_levels",
             "position_x",
             "position_y",
             "connections_out",
         ]
 
+    def get_image_levels(self, obj):
+        """
+        URLs of the image by level from the full one to the preview, a level the
+        screen does not have is served by the next larger one.
+        """
+        request = self.context.get("request")
+        build_url = request.build_absolute_uri if request is not None else str
+        storage = obj.image.storage
+        urls = {}
+        url = build_url(obj.image.url)
+        for level in LEVELS:
+            name = obj.image_levels.get(level)
+            if name:
+                url = build_url(storage.url(name))
+            urls[level] = url
+        return urls
+
 
 class CommentSerializer(ModelSerializer):
     author = ProfileSerializer(read_only=True)
@@ -80,6 +100,7 @@ class PlatformSerializer(serializers.ModelSerializer):
 class FlowSimpleSerializer(ModelSerializer):
     total_likes = serializers.ReadOnlyField()
     is_liked = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
     genres = GenreSerializer(many=True, read_only=True)
     platforms = PlatformSerializer(many=True, read_only=True)
 
@@ -91,16 +112,30 @@ class FlowSimpleSerializer(ModelSerializer):
             "date",
             "total_likes",
             "flow_thumbnail_url",
+            "thumbnails",
             "genres",
             "platforms",
             "is_liked",
         ]
 
+    def get_thumbnails(self, obj):
+        """URLs of thumbnail derivatives by format and size, e.g. {"webp": {"160": url}}."""
+        storage = Flow._meta.get_field("flow_thumbnail_url").storage
+        request = self.context.get("request")
+        build_url = request.build_absolute_uri if request is not None else str
+        return {
+            name: {size: build_url(storage.url(path)) for size, path in by_size.items()}
+            for name, by_size in obj.thumbnails.items()
+        }
+
     def get_is_liked(self, obj):
         user = self.context.get("request").user
-        if user.is_authenticated:
-            return obj.likes.filter(user=user.profile).exists()
-        return False
+        if not user.is_authenticated:
+            return False
+        if hasattr(obj, "is_liked"):
+            # annotated by flow_selector.with_listing_data
+            return obj.is_liked
+        return obj.likes.filter(user=user.profile).exists()
 
 
 class FlowSerializer(ModelSerializer):
@@ -119,13 +154,50 @@ class FlowSerializer(ModelSerializer):
 
     class Meta:
         model = Flow
-        exclude = ["flow_thumbnail_url"]
+        exclude = [
+            "flow_thumbnail_url",
+            "thumbnails",
+            "likes_count",
+            "screens_count",
+            "comments_count",
+            "popularity",
+            "search_vector",
+        ]
 
     def get_is_liked(self, obj):
         user = self.context.get("request").user
-        if user.is_authenticated:
-            return obj.likes.filter(user=user.profile).exists()
-        return False
+        if not user.is_authenticated:
+            return False
+        if hasattr(obj, "is_liked"):
+            # annotated by flow_selector.get_flow_detail
+            return obj.is_liked
+        return obj.likes.filter(user=user.profile).exists()
+
+
+class FlowSocialSerializer(ModelSerializer):
+    """Social part of FlowSerializer cached apart from the rest of a detail."""
+
+    total_likes = serializers.ReadOnlyField()
+    comments = CommentSerializer(read_only=True, many=True)
+
+    class Meta:
+        model = Flow
+        fields = ["total_likes", "comments"]
+
+
+class FlowBuildJobSerializer(ModelSerializer):
+    class Meta:
+        model = FlowBuildJob
+        fields = [
+            "id",
+            "status",
+            "stage",
+            "progress",
+            "flow",
+            "error",
+            "created_at",
+            "updated_at",
+        ]
 
 
 class LikesSerializer(ModelSerializer):
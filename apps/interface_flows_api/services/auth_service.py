@@ -1,13 +1,111 @@
-from apps.interface_flows_api.models import User
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import UserManager
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+from apps.interface_flows_api.models import Profile, User
 
 
 class AuthService:
     @staticmethod
     def create_user(username: str, password: str, email: str) -> User:
-        user = User.objects.create_user(username=username, email=email)
-        user.set_password(password)
-        user.save()
-        return user
+        return User.objects.create_user(
+            username=username, email=email, password=password
+        )
+
+    @staticmethod
+    def hash_passwords(passwords: List[str], processes: int = 1) -> List[str]:
+        """Password hashes, computed by a local process pool when `processes` > 1."""
+        if processes <= 1 or len(passwords) <= 1:
+            return [make_password(password) for password in passwords]
+        chunksize = max(len(passwords) // (processes * 4), 1)
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+    def bulk_create_users(
+        self,
+        users: Iterable[Dict[str, str]],
+        batch_size: int = 1000,
+        processes: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """
+        Create users given as dicts with username, email and password, together with
+        their profiles and tokens. Rows are inserted with bulk_create in batches, so no
+        post_save signal runs, and usernames that already exist are skipped, also
+        when they are created by a concurrent import.
+        Returns the numbers of created and skipped users.
+        """
+        processes = processes or os.cpu_count() or 1
+        result = {"created": 0, "skipped": 0}
+        users = iter(users)
+        while batch := list(islice(users, batch_size)):
+            created = self._create_batch(batch, processes)
+            result["created"] += created
+            result["skipped"] += len(batch) - created
+        return result
+
+    def _create_batch(self, batch: List[Dict[str, str]], processes: int) -> int:
+        rows = {}
+        for row in batch:
+            username = User.normalize_username(row["username"])
+            rows.setdefault(username, row)
+        rows = self._without_existing(rows)
+        if not rows:
+            return 0
+
+        passwords = self.hash_passwords(
+            [row["password"] for row in rows.values()], processes
+        )
+        users = {
+            username: User(
+                username=username,
+                email=UserManager.normalize_email(row.get("email", "")),
+                password=password,
+            )
+            for (username, row), password in zip(rows.items(), passwords)
+        }
+        while users:
+            try:
+                return self._insert_users(list(users.values()))
+            except IntegrityError:
+                # usernames taken by a concurrent import since they were checked
+                remaining = self._without_existing(users)
+                if len(remaining) == len(users):
+                    raise
+                users = remaining
+        return 0
+
+    @staticmethod
+    def _without_existing(users: Dict[str, object]) -> Dict[str, object]:
+        existing = set(
+            User.objects.filter(username__in=users).values_list("username", flat=True)
+        )
+        return {
+            username: user
+            for username, user in users.items()
+            if username not in existing
+        }
+
+    @staticmethod
+    def _insert_users(users: List[User]) -> int:
+        """Insert users with their profiles and tokens, all of them or none."""
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            if any(user.pk is None for user in users):
+                # backends not returning primary keys of inserted rows
+                users = list(
+                    User.objects.filter(username__in=[user.username for user in users])
+                )
+            Profile.objects.bulk_create(Profile(user=user) for user in users)
+            Token.objects.bulk_create(
+                Token(key=Token.generate_key(), user=user) for user in users
+            )
+        return len(users)
 
 
 auth_service = AuthService()
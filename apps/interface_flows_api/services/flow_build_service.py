@@ -1,32 +1,58 @@
 from __future__ import annotations
 
 import tempfile
-from typing import Iterable, List
+from itertools import islice
+from typing import Callable, Dict, List, Tuple
 
-import cv2
-import numpy as np
-from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import InMemoryUploadedFile
 
+import apps.interface_flows_api.config as config
 from apps.interface_flows_api.exceptions import (
     MLServicesException, MLServicesUnavailableException,
     UnverifiedFlowExistsException, VideoProcessingException)
-from apps.interface_flows_api.models import (Connection, Flow, FlowStatus,
-                                             Genre, Platform, Screen,
-                                             ScreenVisualProperties, User)
+from apps.interface_flows_api.models import (Connection, Flow, FlowBuildStage,
+                                             FlowStatus, Genre, Platform,
+                                             Screen, ScreenVisualProperties,
+                                             User)
 from apps.interface_flows_api.selectors.flow_selector import flow_selector
 from apps.interface_flows_api.selectors.selector import SelectionOption
-from apps.interface_flows_api.services.ml_provider import ml_service_provider
-from apps.interface_flows_api.utils.encoder import numpy_array_to_io
-from apps.interface_flows_api.utils.resizer import resize_image
+from apps.interface_flows_api.services.flow_cache_service import \
+    flow_cache_service
+from apps.interface_flows_api.services.flow_counter_service import \
+    flow_counter_service
+from apps.interface_flows_api.services.ml_provider import (
+    MachineLearningServicePrediction, ml_service_provider)
+from apps.interface_flows_api.utils.dedup import (DeduplicatedFrames,
+                                                  deduplicate_frames)
+from apps.interface_flows_api.utils.frame_store import FrameStore
+from apps.interface_flows_api.utils.layout import compute_layout
+from apps.interface_flows_api.utils.pyramid import (build_levels_many,
+                                                    get_level_name)
+from apps.interface_flows_api.utils.resizer import (make_thumbnails,
+                                                    resize_image)
+from apps.interface_flows_api.utils.storage import read_files, upload_files
+from apps.interface_flows_api.utils.video import (estimate_sampled_frames,
+                                                  iter_video_frames)
+
+ProgressCallback = Callable[[FlowBuildStage, int], None]
 
 
 class FlowBuildService:
     MAX_TIME_BETWEEN_SCREENS = 100
+    FRAME_DEDUP_THRESHOLD = config.FRAME_DEDUP_THRESHOLD
 
     @staticmethod
-    def cut_video_into_frames(video_file: InMemoryUploadedFile, interval: int = 3):
+    def _report_progress(
+        progress: ProgressCallback, stage: FlowBuildStage, percent: int
+    ) -> None:
+        if progress is not None:
+            progress(stage, percent)
+
+    @staticmethod
+    def cut_video_into_frames(
+        video_file: InMemoryUploadedFile, interval: int = 3
+    ) -> FrameStore:
         try:
             with tempfile.NamedTemporaryFile(
                 suffix=".mp4", delete=True
@@ -35,41 +61,34 @@ class FlowBuildService:
                     temp_video_file.write(chunk)
                 temp_video_file.flush()
 
-                video = cv2.VideoCapture(temp_video_file.name)
-                fps = video.get(cv2.CAP_PROP_FPS)
-                frame_interval = int(fps) * interval
-                total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-
-                frames = []
-                for frame_index in range(0, total_frames, frame_interval):
-                    video.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
-                    success, frame = video.read()
-                    if success:
-                        frames.append(frame)
-                video.release()
-                return frames
+                return FrameStore.from_frames(
+                    iter_video_frames(temp_video_file.name, interval),
+                    capacity=estimate_sampled_frames(temp_video_file.name, interval),
+                )
         except Exception:
             raise VideoProcessingException
 
     @staticmethod
-    def _get_screen_size(image: np.array) -> (int, int):
-        height, width = image.shape[:2]
-        return width, height
-
-    @staticmethod
-    def _np_to_image(
-        image_np: np.array, image_format: str = "JPEG", filename: str = "default"
-    ) -> ContentFile:
-        buffered = numpy_array_to_io(image_np)
-        buffered.seek(0)
-        filename = f"{filename}.{image_format.lower()}"
-        return ContentFile(buffered.read(), name=filename)
-
-    @staticmethod
-    def _update_flow_screen_pos(screen: Screen, x: int, y: int) -> None:
-        screen.position_x = x
-        screen.position_y = y
-        screen.save()
+    def _restore_frame_indices(
+        predictions: List[MachineLearningServicePrediction],
+        unique_frames: DeduplicatedFrames,
+        interval: int,
+    ) -> List[MachineLearningServicePrediction]:
+        """
+        Map predictions made on deduplicated frames back onto the extracted frames.
+        Times are counted in `interval` steps per sent frame, so a screen enters at the first
+        frame of its run and leaves at the last one.
+        """
+        return [
+            MachineLearningServicePrediction(
+                index=unique_frames.original_index(prediction.index),
+                time_in=unique_frames.original_index(prediction.time_in // interval)
+                * interval,
+                time_out=unique_frames.original_run_end(prediction.time_out // interval)
+                * interval,
+            )
+            for prediction in predictions
+        ]
 
     @staticmethod
     def _add_get_screen_properties(width: int, height: int) -> ScreenVisualProperties:
@@ -78,27 +97,45 @@ class FlowBuildService:
         )
         return properties
 
-    @staticmethod
-    def _add_screens_connection(screen_out: Screen, screen_in: Screen) -> Connection:
-        try:
-            direct_connection = Connection.objects.get(
-                screen_out=screen_out, screen_in=screen_in
-            )
-            return direct_connection
-        except ObjectDoesNotExist:
-            pass
-
-        try:
-            reverse_connection = Connection.objects.get(
-                screen_out=screen_in, screen_in=screen_out
-            )
-            reverse_connection.bidirectional = True
-            reverse_connection.save()
-            return reverse_connection
-        except ObjectDoesNotExist:
-            pass
+    @classmethod
+    def _collect_connections(
+        cls, predictions: List[MachineLearningServicePrediction]
+    ) -> Dict[Tuple[int, int], bool]:
+        """
+        Transitions between consecutive screens keyed by (screen_out, screen_in) numbers.
+        A transition back over an existing edge makes it bidirectional instead of adding one.
+        """
+        connections = {}
+        for previous, current in zip(predictions, predictions[1:]):
+            if current.time_in - previous.time_out >= cls.MAX_TIME_BETWEEN_SCREENS:
+                continue
+            edge = (previous.index, current.index)
+            reverse_edge = (current.index, previous.index)
+            if edge in connections:
+                continue
+            if reverse_edge in connections:
+                connections[reverse_edge] = True
+            else:
+                connections[edge] = False
+        return connections
 
-        return Connection.objects.create(screen_out=screen_out, screen_in=screen_in)
+    @staticmethod
+    def _add_screens_connections(
+        screens: Dict[int, Screen], connections: Dict[Tuple[int, int], bool]
+    ) -> List[Connection]:
+        return Connection.objects.bulk_create(
+            [
+                Connection(
+                    screen_out=screens[screen_out],
+                    screen_in=screens[screen_in],
+                    bidirectional=bidirectional,
+                )
+                for (screen_out, screen_in), bidirectional in connections.items()
+            ],
+            update_conflicts=True,
+            update_fields=["bidirectional"],
+            unique_fields=["screen_out", "screen_in"],
+        )
 
     @staticmethod
     def _get_filename_prefix(title: str) -> str:
@@ -110,50 +147,120 @@ class FlowBuildService:
     @staticmethod
     def _add_thumbnail(flow: Flow, image: InMemoryUploadedFile, prefix) -> Flow:
         buffed, f = resize_image(image)
+        image.seek(0)
+        thumbnails = make_thumbnails(
+            image, config.THUMBNAIL_SIZES, quality=config.THUMBNAIL_QUALITY
+        )
+
+        image_field = Flow._meta.get_field("flow_thumbnail_url")
+        names = {
+            (name, size): image_field.generate_filename(None, f"{prefix}_{size}.{name}")
+            for name, by_size in thumbnails.items()
+            for size in by_size
+        }
+        saved_names = upload_files(
+            image_field.storage,
+            {names[key]: thumbnails[key[0]][key[1]] for key in names},
+        )
+        flow.thumbnails = {
+            name: {str(size): saved_names[names[name, size]] for size in by_size}
+            for name, by_size in thumbnails.items()
+        }
+
         image = ContentFile(buffed.getvalue())
         image.name = f"{prefix}.{f}"
         flow.flow_thumbnail_url = image
         flow.save()
         return flow
 
-    def _add_screen(self, flow: Flow, image: np.array, prefix: str, pid: int) -> Screen:
-        screen_num = "{:02d}".format(pid)
-        filename = f"{prefix}_{screen_num}"
-        image = self._np_to_image(image_np=image, filename=filename)
-        return Screen.objects.create(flow=flow, flow_screen_number=pid, image=image)
-
-    def _compute_screen_position(
-        self, visited: set, graph: dict, node: Screen, x: int, y: int
-    ) -> int | None:
-        if node not in visited:
-            self._update_flow_screen_pos(node, x, y)
-            visited.add(node)
-            i = 0
-            for neighbour in graph[node]:
-                next_x = x + 1
-                next_y = y + 1 if i > 0 else y
-                dy = self._compute_screen_position(
-                    visited, graph, neighbour, next_x, next_y
-                )
-                if dy is None:
-                    continue
-                y = dy
-                i += 1
-            del graph[node]
-            return y
-        return None
-
-    def _build_graph(self, flow: Flow) -> Iterable[Screen]:
-        screens = flow_selector.get_flow_screens(flow)
-        graph = {}
+    @staticmethod
+    def _get_level_files(
+        images: Dict[str, bytes]
+    ) -> Tuple[Dict[str, bytes], Dict[str, Dict[str, str]]]:
+        """Downscaled levels of images keyed by name: the level files and their names by image."""
+        levels = build_levels_many(list(images.values()), config.SCREEN_PREVIEW_WIDTH)
+        files, names = {}, {}
+        for name, image_levels in zip(images, levels):
+            names[name] = {level: get_level_name(name, level) for level in image_levels}
+            files.update(
+                {names[name][level]: data for level, data in image_levels.items()}
+            )
+        return files, names
+
+    @classmethod
+    def _add_screens(
+        cls,
+        flow: Flow,
+        images: Dict[int, bytes],
+        prefix: str,
+        image_format: str = "JPEG",
+    ) -> Dict[int, Screen]:
+        """
+        Upload screen images with their downscaled levels concurrently under
+        deterministic names and insert all rows at once.
+        """
+        image_field = Screen._meta.get_field("image")
+        names = {
+            pid: image_field.generate_filename(
+                None, "{}_{:02d}.{}".format(prefix, pid, image_format.lower())
+            )
+            for pid in images
+        }
+        files = {names[pid]: image for pid, image in images.items()}
+        level_files, level_names = cls._get_level_files(files)
+        saved_names = upload_files(image_field.storage, {**files, **level_files})
+        screens = Screen.objects.bulk_create(
+            Screen(
+                flow=flow,
+                flow_screen_number=pid,
+                image=saved_names[names[pid]],
+                image_levels={
+                    level: saved_names[name]
+                    for level, name in level_names[names[pid]].items()
+                },
+            )
+            for pid in images
+        )
+        return {screen.flow_screen_number: screen for screen in screens}
+
+    def add_missing_screen_levels(self, batch_size: int = 100) -> int:
+        """
+        Build downscaled levels of screens stored without them, returns the number of
+        updated screens. Screens whose image cannot be read are left as they are.
+        """
+        image_field = Screen._meta.get_field("image")
+        screens = (
+            Screen.objects.filter(image_levels={})
+            .exclude(image=image_field.default)
+            .only("id", "flow_id", "image", "image_levels")
+            .order_by("id")
+            .iterator(chunk_size=batch_size)
+        )
+        updated = 0
+        while batch := list(islice(screens, batch_size)):
+            images = read_files(image_field.storage, [s.image.name for s in batch])
+            level_files, level_names = self._get_level_files(images)
+            saved_names = upload_files(image_field.storage, level_files)
+            batch = [screen for screen in batch if screen.image.name in level_names]
+            for screen in batch:
+                screen.image_levels = {
+                    level: saved_names[name]
+                    for level, name in level_names[screen.image.name].items()
+                }
+            Screen.objects.bulk_update(batch, ["image_levels"])
+            # levels are written in bulk, which sends no model signals
+            for flow_id in {screen.flow_id for screen in batch}:
+                flow_cache_service.invalidate(flow_id, flow_cache_service.GRAPH)
+            updated += len(batch)
+        return updated
+
+    @staticmethod
+    def _build_graph(flow: Flow) -> List[Screen]:
+        screens, graph = flow_selector.get_flow_graph(flow)
+        positions = compute_layout(graph)
         for screen in screens:
-            graph[screen] = flow_selector.get_connected_screens(screen)
-        visited = set()
-        y = 0
-        while len(graph) != 0:
-            current_node = max(graph, key=lambda x: len(graph[x]))
-            y = self._compute_screen_position(visited, graph, current_node, 0, y)
-            y += 1
+            screen.position_x, screen.position_y = positions[screen.id]
+        Screen.objects.bulk_update(screens, ["position_x", "position_y"])
         return screens
 
     def create_new_flow(
@@ -166,25 +273,56 @@ class FlowBuildService:
         interval: int = 1,
         platforms: List[Platform] = None,
         genres: List[Genre] = None,
+        progress: ProgressCallback = None,
     ) -> Flow:
         if flow_selector.if_user_reach_unverified_flows_limit(user):
             raise UnverifiedFlowExistsException
 
+        self._report_progress(progress, FlowBuildStage.EXTRACTING, 5)
         try:
             frames = self.cut_video_into_frames(video_file, interval)
         except VideoProcessingException:
             raise VideoProcessingException
 
+        with frames:
+            return self._create_flow_from_frames(
+                frames=frames,
+                title=title,
+                user=user,
+                thumbnail_file=thumbnail_file,
+                source=source,
+                interval=interval,
+                platforms=platforms,
+                genres=genres,
+                progress=progress,
+            )
+
+    def _create_flow_from_frames(
+        self,
+        frames: FrameStore,
+        title: str,
+        user: User,
+        thumbnail_file: InMemoryUploadedFile,
+        source: str,
+        interval: int,
+        platforms: List[Platform],
+        genres: List[Genre],
+        progress: ProgressCallback,
+    ) -> Flow:
+        self._report_progress(progress, FlowBuildStage.RECOGNIZING, 30)
+        unique_frames = deduplicate_frames(frames, self.FRAME_DEDUP_THRESHOLD)
         try:
             predictions = ml_service_provider.get_direct_graph(
-                frames, images_interval=interval
+                frames.ml_images(unique_frames.indices), images_interval=interval
             )
         except MLServicesUnavailableException:
             raise MLServicesUnavailableException
         except MLServicesException:
             raise MLServicesUnavailableException
+        predictions = self._restore_frame_indices(predictions, unique_frames, interval)
 
-        width, height = self._get_screen_size(frames[0])
+        self._report_progress(progress, FlowBuildStage.SAVING, 60)
+        width, height = frames.screen_size
         screens_properties = self._add_get_screen_properties(width, height)
         prefix = self._get_filename_prefix(title)
 
@@ -209,34 +347,18 @@ class FlowBuildService:
         if thumbnail_file is not None:
             self._add_thumbnail(flow=flow, image=thumbnail_file, prefix=prefix)
 
-        previous_screen = None
-        seen_screens_indices = set()
-
-        for i, prediction in enumerate(predictions):
-            if prediction.index not in seen_screens_indices:
-                screen = self._add_screen(
-                    flow=flow,
-                    image=frames[prediction.index],
-                    pid=prediction.index,
-                    prefix=prefix,
-                )
-                seen_screens_indices.add(prediction.index)
-            else:
-                screen = Screen.objects.get(
-                    flow=flow, flow_screen_number=prediction.index
-                )
-            if (
-                i > 0
-                and predictions[i].time_in - predictions[i - 1].time_out
-                < self.MAX_TIME_BETWEEN_SCREENS
-            ):
-                self._add_screens_connection(
-                    screen_out=previous_screen, screen_in=screen
-                )
-
-            previous_screen = screen
+        screens_indices = list(dict.fromkeys(p.index for p in predictions))
+        images = dict(zip(screens_indices, frames.encode(screens_indices)))
+        screens = self._add_screens(flow=flow, images=images, prefix=prefix)
+        del images
+        frames.forget_encoded()
+        flow_counter_service.increment(flow, "screens_count", len(screens))
+        self._add_screens_connections(screens, self._collect_connections(predictions))
 
+        self._report_progress(progress, FlowBuildStage.LAYOUT, 90)
         self._build_graph(flow)
+        # screens and layout are written in bulk, which sends no model signals
+        flow_cache_service.invalidate(flow.id)
 
         return flow
 
@@ -0,0 +1,145 @@
+from typing import Dict, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+import apps.interface_flows_api.config as config
+from apps.interface_flows_api.models import (Flow, FlowStatus, FlowVisibility,
+                                             User)
+from apps.interface_flows_api.selectors.flow_selector import flow_selector
+from apps.interface_flows_api.services.version_service import version_service
+
+
+class FlowCacheService:
+    """
+    Rendered flow details kept in the Django cache.
+    A detail is stored in two parts with their own versions: the graph part (screens,
+    connections, layout and flow fields) which only changes when a flow is rebuilt or
+    edited, and the social part (likes and comments), which is rendered alone when
+    only it is missing. Whether a user liked a flow is stored per user. Writes bump
+    the versions (see VersionService), so stale entries are never read again and
+    expire on their own.
+    """
+
+    GRAPH = "graph"
+    SOCIAL = "social"
+    parts = (GRAPH, SOCIAL)
+    social_fields = ("total_likes", "comments")
+    timeout = config.FLOW_CACHE_TIMEOUT
+
+    @staticmethod
+    def _version_name(flow_id: int, part: str) -> str:
+        return f"flow:{flow_id}:{part}"
+
+    @staticmethod
+    def _liked_key(flow_id: int, profile_id: int) -> str:
+        return f"flow:{flow_id}:liked:{profile_id}"
+
+    def get_versions(
+        self, flow_id: int, start_missing: bool = True
+    ) -> Optional[Dict[str, int]]:
+        """
+        Versions a detail is rendered from: its parts and the genres and platforms
+        catalogs, whose names are embedded into the graph part. Without
+        `start_missing` None is returned when the parts were never versioned.
+        """
+        names = {part: self._version_name(flow_id, part) for part in self.parts}
+        if start_missing:
+            parts = version_service.get_many(*names.values())
+        else:
+            parts = version_service.get_started(*names.values())
+            if parts is None:
+                return None
+        versions = version_service.get_many(
+            version_service.GENRES, version_service.PLATFORMS
+        )
+        versions.update({part: parts[name] for part, name in names.items()})
+        return versions
+
+    def get_cached_versions(self, flow_id: int) -> Optional[Dict[str, int]]:
+        """
+        Versions of a detail whose graph part is cached, None for any other.
+        Cached details exist and are public, so validators built from these never
+        answer a request for a missing or private flow, and no version is started.
+        """
+        versions = self.get_versions(flow_id, start_missing=False)
+        if versions is None:
+            return None
+        if not cache.has_key(self._part_keys(flow_id, versions)[self.GRAPH]):
+            return None
+        return versions
+
+    def _part_keys(self, flow_id: int, versions: Dict[str, int]) -> Dict[str, str]:
+        catalogs = (
+            f"{versions[version_service.GENRES]}:{versions[version_service.PLATFORMS]}"
+        )
+        return {
+            self.GRAPH: f"flow:{flow_id}:graph:{versions[self.GRAPH]}:{catalogs}",
+            self.SOCIAL: f"flow:{flow_id}:social:{versions[self.SOCIAL]}",
+        }
+
+    def invalidate(self, flow_id: int, *parts: str) -> None:
+        """Move parts of a flow, all of them by default, and flow listings to new versions."""
+        names = [self._version_name(flow_id, part) for part in parts or self.parts]
+        version_service.bump(*names, version_service.FLOWS)
+
+    def get_parts(self, flow_id: int, versions: Dict[str, int]) -> Dict[str, dict]:
+        """Cached parts of a detail rendered at `versions`, missing ones are left out."""
+        keys = self._part_keys(flow_id, versions)
+        parts = cache.get_many(keys.values())
+        return {part: parts[key] for part, key in keys.items() if key in parts}
+
+    @staticmethod
+    def is_cacheable(flow: Flow) -> bool:
+        """Only details everyone may see are cached, so cached ones need no access check."""
+        return (
+            flow.visibility == FlowVisibility.PUBLIC
+            and flow.status == FlowStatus.VERIFIED
+        )
+
+    def set_parts(
+        self, flow_id: int, parts: Dict[str, dict], versions: Dict[str, int]
+    ) -> None:
+        """Store parts of a detail rendered after `versions` were read."""
+        keys = self._part_keys(flow_id, versions)
+        cache.set_many(
+            {keys[part]: data for part, data in parts.items()}, timeout=self.timeout
+        )
+
+    def set_detail(self, flow_id: int, data: dict, versions: Dict[str, int]) -> None:
+        """Store both parts of a detail rendered after `versions` were read."""
+        social = {field: data[field] for field in self.social_fields}
+        graph = {
+            field: value
+            for field, value in data.items()
+            if field not in self.social_fields and field != "is_liked"
+        }
+        self.set_parts(flow_id, {self.GRAPH: graph, self.SOCIAL: social}, versions)
+
+    def get_is_liked(self, flow_id: int, user: User) -> bool:
+        if not user.is_authenticated:
+            return False
+        key = self._liked_key(flow_id, user.profile.id)
+        is_liked = cache.get(key)
+        if is_liked is None:
+            is_liked = flow_selector.is_liked_by(flow_id, user)
+            cache.set(key, is_liked, timeout=self.timeout)
+        return is_liked
+
+    async def aget_is_liked(self, flow_id: int, user: User) -> bool:
+        if not user.is_authenticated:
+            return False
+        key = self._liked_key(flow_id, user.profile.id)
+        is_liked = await cache.aget(key)
+        if is_liked is None:
+            is_liked = await flow_selector.ais_liked_by(flow_id, user)
+            await cache.aset(key, is_liked, timeout=self.timeout)
+        return is_liked
+
+    def set_is_liked(self, flow_id: int, profile_id: int, is_liked: bool) -> None:
+        key = self._liked_key(flow_id, profile_id)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.set(key, is_liked, timeout=self.timeout))
+
+
+flow_cache_service = FlowCacheService()
@@ -0,0 +1,79 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from apps.interface_flows_api.models import Comment, Flow, Like, Screen
+from apps.interface_flows_api.services.flow_cache_service import \
+    flow_cache_service
+from apps.interface_flows_api.services.version_service import version_service
+from apps.interface_flows_api.utils.popularity import compute_popularity
+
+
+class FlowCounterService:
+    """Maintains the denormalized counters stored on flows."""
+
+    counted_models = {
+        "likes_count": Like,
+        "screens_count": Screen,
+        "comments_count": Comment,
+    }
+
+    @staticmethod
+    def increment(flow: Flow, counter: str, delta: int = 1) -> Flow:
+        Flow.objects.filter(pk=flow.pk).update(**{counter: F(counter) + delta})
+        flow.refresh_from_db(fields=[counter])
+        flow_cache_service.invalidate(
+            flow.pk,
+            (
+                flow_cache_service.GRAPH
+                if counter == "screens_count"
+                else flow_cache_service.SOCIAL
+            ),
+        )
+        return flow
+
+    @staticmethod
+    def refresh_popularity(flow: Flow) -> Flow:
+        """Recompute the popularity of a flow after its likes changed."""
+        flow.popularity = compute_popularity(flow.likes_count, flow.date)
+        Flow.objects.filter(pk=flow.pk).update(popularity=flow.popularity)
+        return flow
+
+    @staticmethod
+    def get_actual_count(model) -> Coalesce:
+        count = (
+            model.objects.filter(flow=OuterRef("pk"))
+            .order_by()
+            .values("flow")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return Coalesce(Subquery(count, output_field=IntegerField()), Value(0))
+
+    def reconcile(self) -> dict:
+        """Recount every counter in bulk, returns the number of repaired flows per counter."""
+        repaired = {}
+        for counter, model in self.counted_models.items():
+            actual_count = self.get_actual_count(model)
+            repaired[counter] = Flow.objects.exclude(**{counter: actual_count}).update(
+                **{counter: actual_count}
+            )
+        repaired["popularity"] = self.reconcile_popularity()
+        if any(repaired.values()):
+            # repaired flows are updated in bulk, listings move to a new version at once
+            version_service.bump(version_service.FLOWS)
+        return repaired
+
+    @staticmethod
+    def reconcile_popularity(batch_size: int = 1000) -> int:
+        flows = Flow.objects.only("id", "likes_count", "date", "popularity")
+        changed = []
+        for flow in flows.iterator(chunk_size=batch_size):
+            popularity = compute_popularity(flow.likes_count, flow.date)
+            if flow.popularity != popularity:
+                flow.popularity = popularity
+                changed.append(flow)
+        Flow.objects.bulk_update(changed, ["popularity"], batch_size=batch_size)
+        return len(changed)
+
+
+flow_counter_service = FlowCounterService()
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Iterator, Optional
+
+from django.core.files.uploadedfile import UploadedFile
+from django.db import (close_old_connections, connection, connections,
+                       transaction)
+from django.db.models import Q
+from django.utils import timezone
+
+import apps.interface_flows_api.config as config
+from apps.interface_flows_api.exceptions import (
+    MLServicesException, MLServicesUnavailableException, MLServiceUnavailable,
+    UnverifiedFlowExists, UnverifiedFlowExistsException, VideoProcessing,
+    VideoProcessingException)
+from apps.interface_flows_api.models import (FlowBuildJob, FlowBuildJobStatus,
+                                             FlowBuildStage, User)
+from apps.interface_flows_api.selectors.flow_selector import flow_selector
+from apps.interface_flows_api.services.flow_build_service import \
+    flow_build_service
+
+logger = logging.getLogger(__name__)
+
+
+class FlowJobService:
+    """
+    Flow builds are queued in the database and executed by worker processes.
+    A running job gets a heartbeat from its worker, workers periodically return
+    jobs whose heartbeat stopped, e.g. after a crash, to the queue.
+    """
+
+    poll_interval = config.JOBS_POLL_INTERVAL
+    heartbeat_interval = config.JOBS_HEARTBEAT_INTERVAL
+    stale_after = timedelta(seconds=config.JOBS_STALE_AFTER)
+    job_errors = {
+        UnverifiedFlowExistsException: UnverifiedFlowExists,
+        VideoProcessingException: VideoProcessing,
+        MLServicesUnavailableException: MLServiceUnavailable,
+        MLServicesException: MLServiceUnavailable,
+    }
+
+    @staticmethod
+    def enqueue_flow_build(
+        user: User,
+        video_file: UploadedFile,
+        thumbnail_file: UploadedFile = None,
+        **parameters,
+    ) -> FlowBuildJob:
+        if flow_selector.if_user_reach_unverified_flows_limit(user):
+            raise UnverifiedFlowExistsException
+        return FlowBuildJob.objects.create(
+            author=user.profile,
+            video=video_file,
+            thumbnail=thumbnail_file,
+            parameters=parameters,
+        )
+
+    @staticmethod
+    def claim_next_job() -> Optional[FlowBuildJob]:
+        with transaction.atomic():
+            job = (
+                FlowBuildJob.objects.select_for_update(skip_locked=True)
+                .filter(status=FlowBuildJobStatus.QUEUED)
+                .order_by("id")
+                .first()
+            )
+            if job is not None:
+                job.status = FlowBuildJobStatus.RUNNING
+                job.heartbeat_at = timezone.now()
+                job.save(update_fields=["status", "heartbeat_at", "updated_at"])
+        return job
+
+    def requeue_stale_jobs(self) -> int:
+        """Running jobs without a recent heartbeat are returned to the queue."""
+        stale_before = timezone.now() - self.stale_after
+        return (
+            FlowBuildJob.objects.filter(status=FlowBuildJobStatus.RUNNING)
+            .filter(
+                Q(heartbeat_at__lt=stale_before)
+                | Q(heartbeat_at__isnull=True, updated_at__lt=stale_before)
+            )
+            .update(status=FlowBuildJobStatus.QUEUED, stage=FlowBuildStage.UPLOADED)
+        )
+
+    @contextmanager
+    def _heartbeat(self, job: FlowBuildJob) -> Iterator[None]:
+        """Refresh the heartbeat of a running job from a thread while it is built."""
+        stopped = threading.Event()
+
+        def beat() -> None:
+            try:
+                while not stopped.wait(self.heartbeat_interval):
+                    FlowBuildJob.objects.filter(
+                        id=job.id, status=FlowBuildJobStatus.RUNNING
+                    ).update(heartbeat_at=timezone.now())
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def _get_job_error(self, error: Exception) -> str:
+        for exception, api_exception in self.job_errors.items():
+            if isinstance(error, exception):
+                return str(api_exception.default_detail)
+
+    @staticmethod
+    def _update_job(job: FlowBuildJob, **fields) -> None:
+        for field, value in fields.items():
+            setattr(job, field, value)
+        job.save(update_fields=[*fields, "updated_at"])
+
+    def run_job(self, job: FlowBuildJob) -> FlowBuildJob:
+        def progress(stage: FlowBuildStage, percent: int) -> None:
+            self._update_job(job, stage=stage, progress=percent)
+
+        try:
+            with self._heartbeat(job), job.video.open("rb") as video_file:
+                flow = flow_build_service.create_new_flow(
+                    **job.parameters,
+                    video_file=video_file,
+                    thumbnail_file=job.thumbnail or None,
+                    user=job.author.user,
+                    progress=progress,
+                )
+        except tuple(self.job_errors) as e:
+            self._update_job(
+                job, status=FlowBuildJobStatus.FAILED, error=self._get_job_error(e)
+            )
+        except Exception:
+            logger.exception("Flow build job %s failed", job.id)
+            self._update_job(
+                job, status=FlowBuildJobStatus.FAILED, error="Unexpected build error."
+            )
+        else:
+            self._update_job(
+                job,
+                status=FlowBuildJobStatus.DONE,
+                stage=FlowBuildStage.FINISHED,
+                progress=100,
+                flow=flow,
+            )
+        finally:
+            job.video.delete(save=False)
+            if job.thumbnail:
+                job.thumbnail.delete(save=False)
+            job.save(update_fields=["video", "thumbnail", "updated_at"])
+        return job
+
+    def run_worker(self, burst: bool = False) -> int:
+        """
+        Process queued jobs one by one until stopped, stale jobs are requeued
+        every heartbeat interval. In burst mode the worker exits as soon as the
+        queue is empty.
+        """
+        processed = 0
+        next_requeue = time.monotonic()
+        while True:
+            close_old_connections()
+            if time.monotonic() >= next_requeue:
+                self.requeue_stale_jobs()
+                next_requeue = time.monotonic() + self.heartbeat_interval
+            job = self.claim_next_job()
+            if job is None:
+                if burst:
+                    return processed
+                time.sleep(self.poll_interval)
+                continue
+            self.run_job(job)
+            processed += 1
+
+    def run_worker_pool(self, processes: int, burst: bool = False) -> int:
+        """Run independent workers in a local process pool sharing the database queue."""
+        # forked workers must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            workers = [pool.submit(_run_worker, burst) for _ in range(processes)]
+            return sum(worker.result() for worker in workers)
+
+
+def _run_worker(burst: bool) -> int:
+    return flow_job_service.run_worker(burst=burst)
+
+
+flow_job_service = FlowJobService()
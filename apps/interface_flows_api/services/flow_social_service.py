@@ -1,25 +1,37 @@
 from __future__ import annotations
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 
 from apps.interface_flows_api.models import Comment, Flow, Like, User
+from apps.interface_flows_api.services.flow_counter_service import \
+    flow_counter_service
 
 
 class FlowSocialService:
     @staticmethod
     def comment_flow(flow: Flow, user: User, text: str) -> Comment:
-        return Comment.objects.create(flow=flow, author=user.profile, text=text)
+        with transaction.atomic():
+            comment = Comment.objects.create(flow=flow, author=user.profile, text=text)
+            flow_counter_service.increment(flow, "comments_count")
+        return comment
 
     @staticmethod
     def like_flow(flow: Flow, user: User, like: bool = True) -> Flow:
-        if like:
-            Like.objects.get_or_create(flow=flow, user=user.profile)
-        else:
-            try:
-                like = Like.objects.get(flow=flow, user=user.profile)
-                like.delete()
-            except ObjectDoesNotExist:
-                raise ObjectDoesNotExist
+        with transaction.atomic():
+            if like:
+                _, created = Like.objects.get_or_create(flow=flow, user=user.profile)
+                if created:
+                    flow_counter_service.increment(flow, "likes_count")
+                    flow_counter_service.refresh_popularity(flow)
+            else:
+                try:
+                    like = Like.objects.get(flow=flow, user=user.profile)
+                    like.delete()
+                except ObjectDoesNotExist:
+                    raise ObjectDoesNotExist
+                flow_counter_service.increment(flow, "likes_count", -1)
+                flow_counter_service.refresh_popularity(flow)
 
         return flow
 
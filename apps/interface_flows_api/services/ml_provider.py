@@ -1,15 +1,24 @@
 import base64
 import json
-import os
+import random
+import struct
+import threading
+import time
 from dataclasses import dataclass
-from typing import List
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import cv2
 import numpy as np
 import requests
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
 
+import apps.interface_flows_api.config as config
 from apps.interface_flows_api.exceptions import (
     MLServicesException, MLServicesUnavailableException)
-from apps.interface_flows_api.utils.encoder import numpy_array_to_io
+from apps.interface_flows_api.utils.circuit_breaker import CircuitBreaker
+from apps.interface_flows_api.utils.dedup import dhash, hamming_distances_to
 
 
 @dataclass
@@ -20,39 +29,276 @@ class MachineLearningServicePrediction:
 
 
 class MachineLearningServiceProvider:
-    def __init__(self, host: str, port: str):
+    JSON_TRANSPORT = "json"
+    BINARY_TRANSPORT = "binary"
+    RETRY_STATUSES = (502, 503, 504)
+    LATENCY_SMOOTHING = 0.2
+    STATUS_CACHE_KEY = "ml_service:status"
+
+    def __init__(
+        self,
+        host: str,
+        port: str,
+        transport: str = JSON_TRANSPORT,
+        batch_size: int = 64,
+        connect_timeout: float = 3,
+        read_timeout: float = 300,
+        retries: int = 2,
+        backoff: float = 0.5,
+        max_backoff: float = 10,
+        pool_size: int = 10,
+        circuit_breaker: CircuitBreaker = None,
+        screen_match_threshold: int = config.FRAME_DEDUP_THRESHOLD,
+    ):
         self.ml_service_url = f"http://{host}:{port}"
+        self.transport = transport
+        self.batch_size = batch_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.screen_match_threshold = screen_match_threshold
+        self.last_latency = None
+        self.average_latency = None
+        self._latency_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _get_backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def _record_latency(self, latency: float) -> None:
+        with self._latency_lock:
+            self.last_latency = latency
+            if self.average_latency is None:
+                self.average_latency = latency
+            else:
+                self.average_latency += self.LATENCY_SMOOTHING * (
+                    latency - self.average_latency
+                )
+
+    def _get_local_status(self) -> dict:
+        def to_ms(latency: float) -> float | None:
+            return None if latency is None else round(latency * 1000, 1)
+
+        breaker = self.circuit_breaker
+        return {
+            "url": self.ml_service_url,
+            "circuit_state": breaker.state.value,
+            "consecutive_failures": breaker.failures,
+            "last_latency_ms": to_ms(self.last_latency),
+            "average_latency_ms": to_ms(self.average_latency),
+            "reported_at": time.time(),
+            "retry_at": (
+                None
+                if breaker.opened_at is None
+                else time.time()
+                + breaker.recovery_timeout
+                - (time.monotonic() - breaker.opened_at)
+            ),
+        }
+
+    def _publish_status(self) -> None:
+        """Share the status with other processes, ML calls run in the build workers."""
+        cache.set(self.STATUS_CACHE_KEY, self._get_local_status(), timeout=None)
+
+    def get_status(self) -> dict:
+        """Status reported by the process which called the ML service last."""
+        status = cache.get(self.STATUS_CACHE_KEY) or self._get_local_status()
+        retry_at = status.pop("retry_at")
+        if status["circuit_state"] == "open" and time.time() >= retry_at:
+            status["circuit_state"] = "half_open"
+        return status
+
+    def _post(
+        self, path: str, make_body: Callable[[], object], headers: dict
+    ) -> requests.Response:
+        """
+        POST through the pooled session, retrying connection errors and gateway failures.
+        The body is rebuilt for every attempt since streamed bodies can be sent only once.
+        """
+        if not self.circuit_breaker.allow_request():
+            raise MLServicesUnavailableException("ML service circuit is open")
+        try:
+            response, error = self._post_with_retries(path, make_body, headers)
+            if response is not None:
+                self.circuit_breaker.record_success()
+                return response
+            self.circuit_breaker.record_failure()
+        except BaseException:
+            # local errors say nothing about the service, only the trial slot is freed
+            self.circuit_breaker.release_trial()
+            raise
+        finally:
+            self._publish_status()
+        raise MLServicesUnavailableException(f"ML service call failed: {error}")
+
+    def _post_with_retries(
+        self, path: str, make_body: Callable[[], object], headers: dict
+    ) -> Tuple[Optional[requests.Response], object]:
+        """The response unless the service failed, server errors count as failures."""
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self._get_backoff(attempt - 1))
+            started = time.monotonic()
+            try:
+                response = self.session.post(
+                    f"{self.ml_service_url}{path}",
+                    data=make_body(),
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+            except requests.exceptions.RequestException as e:
+                error = e
+                continue
+            self._record_latency(time.monotonic() - started)
+            if response.status_code < 500:
+                return response, None
+            error = f"status {response.status_code}"
+            if response.status_code not in self.RETRY_STATUSES:
+                break
+        return None, error
+
+    @staticmethod
+    def image_to_base64(image: bytes) -> str:
+        return base64.b64encode(image).decode("utf-8")
 
     @staticmethod
-    def numpy_array_to_base64(image_np: np.array) -> str:
-        buffered = numpy_array_to_io(image_np)
-        return base64.b64encode(buffered.getvalue()).decode("utf-8")
+    def _parse_predictions(response) -> List[MachineLearningServicePrediction]:
+        if response.status_code != 200:
+            raise MLServicesException
+        return [
+            MachineLearningServicePrediction(**prediction)
+            for prediction in response.json()
+        ]
+
+    @staticmethod
+    def _iter_binary_frames(images: Iterable[bytes]) -> Iterator[bytes]:
+        """Length-prefixed JPEG frames: a 4-byte big-endian size followed by the image."""
+        for image in images:
+            yield struct.pack(">I", len(image))
+            yield image
 
     def get_direct_graph(
-        self, images, images_interval: int = 1
+        self, images: Iterable[bytes], images_interval: int = 1
+    ) -> List[MachineLearningServicePrediction]:
+        if self.transport == self.BINARY_TRANSPORT:
+            return self._get_direct_graph_streamed(images, images_interval)
+        return self._get_direct_graph_json(images, images_interval)
+
+    def _get_direct_graph_json(
+        self, images: Iterable[bytes], images_interval: int
     ) -> List[MachineLearningServicePrediction]:
-        encoded_images = [self.numpy_array_to_base64(image) for image in images]
+        encoded_images = [self.image_to_base64(image) for image in images]
         data = json.dumps(
             {"encoded_images": encoded_images, "images_interval": images_interval}
         )
-        try:
-            response = requests.post(
-                f"{self.ml_service_url}/flow",
-                data=data,
-                headers={"Content-Type": "application/json"},
+        response = self._post(
+            "/flow",
+            lambda: data,
+            headers={"Content-Type": "application/json"},
+        )
+        return self._parse_predictions(response)
+
+    @staticmethod
+    def _hash_image(image: bytes) -> np.array:
+        frame = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return dhash([frame])[0]
+
+    def _match_screens(
+        self,
+        batch: List[bytes],
+        indices: Iterable[int],
+        offset: int,
+        screen_hashes: Dict[int, np.array],
+    ) -> Dict[int, int]:
+        """
+        Whole video indices of the screens predicted in a batch. A screen whose first
+        frame matches a screen of an earlier batch takes its index, others are added
+        to `screen_hashes`.
+        """
+        known_screens = list(screen_hashes)
+        known_hashes = np.stack(list(screen_hashes.values())) if known_screens else None
+        matched = {}
+        for index in sorted(indices):
+            image_hash = self._hash_image(batch[index])
+            if known_hashes is not None:
+                distances = hamming_distances_to(known_hashes, image_hash)
+                closest = int(distances.argmin())
+                if distances[closest] <= self.screen_match_threshold:
+                    matched[index] = known_screens[closest]
+                    continue
+            matched[index] = index + offset
+            screen_hashes[index + offset] = image_hash
+        return matched
+
+    def _get_direct_graph_streamed(
+        self, images: Iterable[bytes], images_interval: int
+    ) -> List[MachineLearningServicePrediction]:
+        """
+        Send JPEG frames in batches as chunked binary bodies.
+        Each batch is predicted independently, its indices and times are shifted by the
+        position of the batch in the whole video. Screens seen again after a batch
+        boundary are merged into the earlier screen, so they are not duplicated and the
+        transitions to them are kept, a screen continuing over a boundary is one visit.
+        """
+        images = iter(images)
+        predictions = []
+        screen_hashes = {}
+        offset = 0
+        while batch := list(islice(images, self.batch_size)):
+            response = self._post(
+                "/flow/stream",
+                lambda: self._iter_binary_frames(batch),
+                headers={
+                    "Content-Type": "application/octet-stream",
+                    "X-Images-Interval": str(images_interval),
+                    "X-Images-Offset": str(offset),
+                },
+            )
+            batch_predictions = self._parse_predictions(response)
+            screens = self._match_screens(
+                batch,
+                {prediction.index for prediction in batch_predictions},
+                offset,
+                screen_hashes,
             )
-            if response.status_code != 200:
-                raise MLServicesException
-            predictions = response.json()
-            predictions = [
-                MachineLearningServicePrediction(**prediction)
-                for prediction in predictions
-            ]
-            return predictions
-        except requests.exceptions.RequestException as e:
-            raise MLServicesUnavailableException(f"ML service call failed: {e}")
+            time_offset = offset * images_interval
+            for prediction in batch_predictions:
+                index = screens[prediction.index]
+                time_out = prediction.time_out + time_offset
+                if predictions and predictions[-1].index == index:
+                    # the screen continues over the batch boundary
+                    predictions[-1].time_out = time_out
+                    continue
+                predictions.append(
+                    MachineLearningServicePrediction(
+                        index=index,
+                        time_in=prediction.time_in + time_offset,
+                        time_out=time_out,
+                    )
+                )
+            offset += len(batch)
+        return predictions
 
 
 ml_service_provider = MachineLearningServiceProvider(
-    host=os.getenv("ML_SERVICE_HOST"), port=os.getenv("ML_SERVICE_PORT")
+    host=config.ML_SERVICE_HOST,
+    port=config.ML_SERVICE_PORT,
+    transport=config.ML_SERVICE_TRANSPORT,
+    batch_size=config.ML_SERVICE_BATCH_SIZE,
+    connect_timeout=config.ML_SERVICE_CONNECT_TIMEOUT,
+    read_timeout=config.ML_SERVICE_READ_TIMEOUT,
+    retries=config.ML_SERVICE_RETRIES,
+    circuit_breaker=CircuitBreaker(
+        failure_threshold=config.ML_SERVICE_FAILURE_THRESHOLD,
+        recovery_timeout=config.ML_SERVICE_RECOVERY_TIMEOUT,
+    ),
+    screen_match_threshold=config.FRAME_DEDUP_THRESHOLD,
 )
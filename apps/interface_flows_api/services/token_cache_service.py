@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+import apps.interface_flows_api.config as config
+from apps.interface_flows_api.models import Profile, User
+from apps.interface_flows_api.services.version_service import version_service
+
+
+class TokenCacheService:
+    """
+    Users of authentication tokens kept in a bounded in-process LRU backed by the
+    Django cache. An entry holds the user fields except the password hash and the
+    profile id, together with the version of the token it was loaded at. Token and
+    user changes bump the version in the Django cache, and every hit is checked
+    against it, so a revoked token or a changed user is not served by any process.
+    The Django cache therefore has to be shared by all hosts running the API, e.g.
+    Redis or Memcached, a per-host cache only revokes tokens on its own host.
+    """
+
+    user_fields = tuple(
+        field.attname
+        for field in User._meta.concrete_fields
+        if field.name != "password"
+    )
+
+    def __init__(
+        self,
+        size: int = config.AUTH_CACHE_SIZE,
+        local_ttl: float = config.AUTH_CACHE_TTL,
+        timeout: int = config.AUTH_CACHE_TIMEOUT,
+    ):
+        self.size = size
+        self.local_ttl = local_ttl
+        self.timeout = timeout
+        self._entries: "OrderedDict[str, Tuple[float, tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token_key: str) -> str:
+        return f"auth:token:{token_key}"
+
+    @staticmethod
+    def _version_name(token_key: str) -> str:
+        return f"token:{token_key}"
+
+    def _remember(self, token_key: str, entry: tuple) -> None:
+        with self._lock:
+            self._entries[token_key] = (time.monotonic(), entry)
+            self._entries.move_to_end(token_key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def _get_entry(self, token_key: str) -> Optional[tuple]:
+        with self._lock:
+            local = self._entries.get(token_key)
+            if local is not None and time.monotonic() - local[0] < self.local_ttl:
+                self._entries.move_to_end(token_key)
+                return local[1]
+        entry = cache.get(self._key(token_key))
+        if entry is not None:
+            self._remember(token_key, entry)
+        return entry
+
+    def get(self, token_key: str) -> Tuple[Optional[User], Optional[int]]:
+        """
+        User of the token with a profile stub, or None, and the current version of the
+        token to `set` a user loaded from the database with. Only the profile id is
+        loaded, other profile fields and the password are fetched on access.
+        Versions are not started here, so keys of unknown tokens leave nothing behind.
+        """
+        versions = version_service.get_started(self._version_name(token_key))
+        if versions is None:
+            return None, None
+        version = versions[self._version_name(token_key)]
+        entry = self._get_entry(token_key)
+        if entry is None or entry[2] != version:
+            return None, version
+        values, profile_id, _ = entry
+        user = User.from_db(DEFAULT_DB_ALIAS, self.user_fields, values)
+        if profile_id is not None:
+            user.profile = Profile.from_db(
+                DEFAULT_DB_ALIAS, ("id", "user_id"), (profile_id, user.id)
+            )
+        return user, version
+
+    def set(self, token_key: str, user: User, version: Optional[int]) -> None:
+        """
+        Cache a user loaded after `version` of the token was read. Without a version
+        it is started, now that the token is known to exist, and the user loaded
+        before it is not cached.
+        """
+        if version is None:
+            version_service.get(self._version_name(token_key))
+            return
+        profile = getattr(user, "profile", None)
+        entry = (
+            tuple(getattr(user, field) for field in self.user_fields),
+            profile.id if profile is not None else None,
+            version,
+        )
+        cache.set(self._key(token_key), entry, timeout=self.timeout)
+        self._remember(token_key, entry)
+
+    def invalidate(self, *token_keys: str) -> None:
+        """Move tokens to new versions, entries cached at older ones are not served."""
+        if not token_keys:
+            return
+        version_service.bump(*(self._version_name(key) for key in token_keys))
+        with self._lock:
+            for token_key in token_keys:
+                self._entries.pop(token_key, None)
+        cache.delete_many([self._key(token_key) for token_key in token_keys])
+
+
+token_cache_service = TokenCacheService()
@@ -0,0 +1,60 @@
+import time
+from typing import Dict, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class VersionService:
+    """
+    Version stamps of mutable data kept in the Django cache.
+    A version is the time in nanoseconds of the last change, so it orders changes and
+    doubles as a modification time for HTTP validators.
+    """
+
+    GENRES = "genres"
+    PLATFORMS = "platforms"
+    FLOWS = "flows"
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return f"version:{name}"
+
+    def get_many(self, *names: str) -> Dict[str, int]:
+        """Current versions, missing ones are started from now."""
+        keys = {name: self._key(name) for name in names}
+        versions = cache.get_many(keys.values())
+        result = {}
+        for name, key in keys.items():
+            if key not in versions:
+                cache.add(key, time.time_ns(), timeout=None)
+                versions[key] = cache.get(key)
+            result[name] = versions[key]
+        return result
+
+    def get_started(self, *names: str) -> Optional[Dict[str, int]]:
+        """Current versions without starting missing ones, None if any is missing."""
+        keys = {name: self._key(name) for name in names}
+        versions = cache.get_many(keys.values())
+        if len(versions) < len(keys):
+            return None
+        return {name: versions[key] for name, key in keys.items()}
+
+    def get(self, name: str) -> int:
+        return self.get_many(name)[name]
+
+    def _set(self, names) -> None:
+        version = time.time_ns()
+        cache.set_many({self._key(name): version for name in names}, timeout=None)
+
+    def bump(self, *names: str) -> None:
+        """
+        Move data to a new version. The versions are bumped once more after the
+        transaction commits, so anything derived from not yet committed data by
+        a concurrent request is not served either.
+        """
+        self._set(names)
+        transaction.on_commit(lambda: self._set(names))
+
+
+version_service = VersionService()
@@ -1,10 +1,21 @@
+from datetime import date
+
 from django.contrib.auth.models import User
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models.signals import post_save
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
-from apps.interface_flows_api.models import Profile
+from apps.interface_flows_api.models import (Comment, Connection, Flow, Genre,
+                                             Like, Platform, Profile, Screen)
+from apps.interface_flows_api.selectors.catalog_selector import (
+    genre_catalog, platform_catalog)
+from apps.interface_flows_api.services.flow_cache_service import \
+    flow_cache_service
+from apps.interface_flows_api.services.token_cache_service import \
+    token_cache_service
+from apps.interface_flows_api.services.version_service import version_service
+from apps.interface_flows_api.utils.popularity import compute_popularity
 
 
 @receiver(post_save, sender=User)
@@ -13,15 +24,89 @@ def create_user_profile(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    try:
-        instance.profile.save()
-    except ObjectDoesNotExist:
-        Profile.objects.create(user=instance)
-
-
 @receiver(post_save, sender=User)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
         Token.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache_service.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, update_fields, **kwargs):
+    # logins only update last_login, which cached users are not checked against
+    if not created and update_fields != frozenset({"last_login"}):
+        keys = Token.objects.filter(user_id=instance.id).values_list("key", flat=True)
+        token_cache_service.invalidate(*keys)
+
+
+@receiver(pre_save, sender=Flow)
+def set_initial_popularity(sender, instance, raw, **kwargs):
+    # date is only filled in by auto_now_add after this signal
+    if instance._state.adding and not raw:
+        instance.popularity = compute_popularity(
+            instance.likes_count, instance.date or date.today()
+        )
+
+
+@receiver(post_save, sender=Flow)
+@receiver(post_delete, sender=Flow)
+def invalidate_flow_detail(sender, instance, **kwargs):
+    flow_cache_service.invalidate(instance.id)
+
+
+@receiver(m2m_changed, sender=Flow.genres.through)
+@receiver(m2m_changed, sender=Flow.platforms.through)
+def invalidate_flow_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    flow_ids = (pk_set or ()) if reverse else [instance.id]
+    for flow_id in flow_ids:
+        flow_cache_service.invalidate(flow_id, flow_cache_service.GRAPH)
+
+
+@receiver(post_save, sender=Screen)
+@receiver(post_delete, sender=Screen)
+def invalidate_flow_screens(sender, instance, **kwargs):
+    flow_cache_service.invalidate(instance.flow_id, flow_cache_service.GRAPH)
+
+
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def invalidate_flow_connections(sender, instance, **kwargs):
+    screens = Screen.objects.filter(id=instance.screen_out_id)
+    for flow_id in screens.values_list("flow_id", flat=True):
+        flow_cache_service.invalidate(flow_id, flow_cache_service.GRAPH)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_flow_comments(sender, instance, **kwargs):
+    flow_cache_service.invalidate(instance.flow_id, flow_cache_service.SOCIAL)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def invalidate_flow_likes(sender, instance, **kwargs):
+    flow_cache_service.invalidate(instance.flow_id, flow_cache_service.SOCIAL)
+    flow_cache_service.set_is_liked(
+        instance.flow_id, instance.user_id, kwargs["signal"] is post_save
+    )
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_genres(sender, instance, **kwargs):
+    genre_catalog.invalidate()
+    version_service.bump(version_service.GENRES)
+
+
+@receiver(post_save, sender=Platform)
+@receiver(post_delete, sender=Platform)
+def invalidate_platforms(sender, instance, **kwargs):
+    platform_catalog.invalidate()
+    version_service.bump(version_service.PLATFORMS)
@@ -1,11 +1,100 @@
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from functools import partial
+from io import BytesIO, StringIO
+from typing import List
+from unittest import skipUnless
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import (AsyncRequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 
-from apps.interface_flows_api.models import Flow, FlowVisibility, Genre, User
+from apps.interface_flows_api.async_views import (AsyncFlowDetailView,
+                                                  AsyncFlowView, AsyncListView,
+                                                  AsyncMyFlowView)
+from apps.interface_flows_api.exceptions import (
+    MLServicesUnavailableException, VideoProcessing, VideoProcessingException)
+from apps.interface_flows_api.models import (Connection, Flow, FlowBuildJob,
+                                             FlowBuildJobStatus,
+                                             FlowBuildStage, FlowStatus,
+                                             FlowVisibility, Genre, Like,
+                                             Platform, Profile, Screen, User)
+from apps.interface_flows_api.pagination import KeysetPagination
+from apps.interface_flows_api.selectors.flow_selector import flow_selector
+from apps.interface_flows_api.services.auth_service import auth_service
+from apps.interface_flows_api.services.flow_build_service import \
+    flow_build_service
+from apps.interface_flows_api.services.flow_cache_service import \
+    flow_cache_service
+from apps.interface_flows_api.services.flow_job_service import flow_job_service
+from apps.interface_flows_api.services.flow_social_service import \
+    flow_social_service
+from apps.interface_flows_api.services.ml_provider import (
+    MachineLearningServicePrediction, MachineLearningServiceProvider,
+    ml_service_provider)
+from apps.interface_flows_api.services.version_service import version_service
+from apps.interface_flows_api.utils.circuit_breaker import CircuitBreaker
+from apps.interface_flows_api.utils.dedup import deduplicate_frames
+from apps.interface_flows_api.utils.encoder import encode_images
+from apps.interface_flows_api.utils.frame_store import FrameStore
+from apps.interface_flows_api.utils.layout import compute_layout
+from apps.interface_flows_api.utils.ml_stub import MLStubServer
+from apps.interface_flows_api.utils.popularity import compute_popularity
+from apps.interface_flows_api.utils.resizer import make_thumbnails
+
+# tests clear the cache, keep them off the file cache shared with local servers
+locmem_cache = override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "interface-flows-tests",
+        }
+    }
+)
+
+
+def make_test_video(
+    frames_count: int = 23, fps: int = 5, screens: List[int] = None
+) -> SimpleUploadedFile:
+    """
+    Write a tiny mp4 where the brightness of every frame encodes its index.
+    If `screens` are given, every second shows a noise pattern seeded by the next of them.
+    """
+    if screens is not None:
+        frames_count = len(screens) * fps
+    with tempfile.NamedTemporaryFile(suffix=".mp4") as video_file:
+        writer = cv2.VideoWriter(
+            video_file.name, cv2.VideoWriter_fourcc(*"mp4v"), fps, (32, 24)
+        )
+        for i in range(frames_count):
+            if screens is None:
+                frame = np.full((24, 32, 3), i * 10, dtype=np.uint8)
+            else:
+                rng = np.random.default_rng(screens[i // fps])
+                frame = rng.integers(0, 255, (24, 32, 3), dtype=np.uint8)
+            writer.write(frame)
+        writer.release()
+        return SimpleUploadedFile("video.mp4", video_file.read())
 
 
+@locmem_cache
 class FlowsTests(APITestCase):
     def setUp(self):
+        cache.clear()
         Genre.objects.create(name="genre_test_1")
         Genre.objects.create(name="genre_test_2")
         User.objects.create_user(
@@ -83,3 +172,933 @@ class FlowsTests(APITestCase):
                 },
             ],
         )
+
+    def test_genres_are_served_from_memory(self):
+        """Test that genres are loaded once and filters resolve names without queries."""
+        self.client.get(reverse("genres"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("genres"))
+        self.assertEqual(len(response.data), 2)
+        with self.assertNumQueries(0):
+            genres = flow_selector.get_genres_by_names(["genre_test_2", "unknown"])
+        self.assertListEqual([genre.name for genre in genres], ["genre_test_2"])
+
+    def test_genres_conditional_request(self):
+        """Test that an unchanged genres list is revalidated without queries."""
+        etag = self.client.get(reverse("genres"))["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("genres"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Genre.objects.create(name="genre_test_3")
+        response = self.client.get(reverse("genres"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
+
+    def test_genres_changed_by_another_process(self):
+        """Test that a version bumped elsewhere reloads the genres served with it."""
+        self.client.get(reverse("genres"))
+        # rows written without signals, as another process would look to this one
+        Genre.objects.bulk_create([Genre(name="genre_test_3")])
+        version_service.bump(version_service.GENRES)
+        response = self.client.get(reverse("genres"))
+        self.assertEqual(len(response.data), 3)
+        genres = flow_selector.get_genres_by_names(["genre_test_3"])
+        self.assertListEqual([genre.name for genre in genres], ["genre_test_3"])
+
+
+@locmem_cache
+class FlowBuildTests(SimpleTestCase):
+    def test_cut_video_into_frames(self):
+        """Test that frames are sampled once per interval without seeking."""
+        with flow_build_service.cut_video_into_frames(make_test_video(), 1) as frames:
+            self.assertEqual(len(frames), 5)
+            self.assertEqual(frames.screen_size, (32, 24))
+            brightness = [round(frame.mean() / 50) for frame in frames]
+            self.assertListEqual(brightness, [0, 1, 2, 3, 4])
+
+    def test_frame_store_spills_to_disk_and_grows(self):
+        """Test that a frame store outgrowing its capacity keeps frames in a memory map."""
+        frames = (np.full((24, 32, 3), i, dtype=np.uint8) for i in range(5))
+        with FrameStore.from_frames(
+            frames, capacity=2, screen_width=16, spill_bytes=0, ml_width=8
+        ) as store:
+            self.assertTrue(store.spilled)
+            self.assertEqual(len(store), 5)
+            self.assertEqual(store.screen_size, (16, 12))
+            self.assertEqual(store[-1].mean(), 4)
+            self.assertEqual(next(store.ml_frames()).shape, (6, 8, 3))
+
+    def test_frame_store_is_closed_on_extraction_error(self):
+        """Test that a failing frame source leaves no spilled temporary file."""
+
+        def frames():
+            yield np.zeros((24, 32, 3), dtype=np.uint8)
+            raise VideoProcessingException
+
+        spill_dir = tempfile.mkdtemp()
+        with patch.object(tempfile, "tempdir", spill_dir):
+            with self.assertRaises(VideoProcessingException):
+                FrameStore.from_frames(frames(), capacity=2, spill_bytes=0)
+        self.assertListEqual(os.listdir(spill_dir), [])
+
+    def test_frames_are_encoded_once(self):
+        """Test that ML images and screens share one JPEG encoding per frame."""
+        frames = (np.full((24, 32, 3), i * 50, dtype=np.uint8) for i in range(3))
+        with FrameStore.from_frames(frames, capacity=3, ml_width=None) as store:
+            ml_images = list(store.ml_images([0, 2]))
+            with patch(
+                "apps.interface_flows_api.utils.frame_store.encode_images"
+            ) as encode:
+                encode.return_value = []
+                screens = store.encode([2, 0])
+            self.assertListEqual(encode.call_args.args[0], [])
+            self.assertListEqual(screens, ml_images[::-1])
+            self.assertEqual(Image.open(BytesIO(screens[0])).size, (32, 24))
+
+    def test_encoded_cache_is_capped(self):
+        """Test that JPEG images over the cache size are encoded again when needed."""
+        frames = (np.full((24, 32, 3), i * 50, dtype=np.uint8) for i in range(3))
+        with FrameStore.from_frames(frames, capacity=3, ml_width=None) as store:
+            store.encoded_cache_bytes = len(store.encode([0])[0])
+            store.encode([1])
+            with patch(
+                "apps.interface_flows_api.utils.frame_store.encode_images"
+            ) as encode:
+                encode.return_value = [b"jpeg"]
+                self.assertEqual(store.encode([1, 0])[0], b"jpeg")
+            (encoded_frame,) = encode.call_args.args[0]
+            self.assertEqual(encoded_frame.mean(), 50)
+
+    def test_thumbnail_derivatives(self):
+        """Test that thumbnails are square, never upscaled and readable in every format."""
+        source = BytesIO()
+        Image.new("RGB", (1200, 400), "red").save(source, format="JPEG")
+        source.seek(0)
+        thumbnails = make_thumbnails(source, [640, 160, 320])
+        self.assertListEqual(sorted(thumbnails), ["jpeg", "webp"])
+        for name, by_size in thumbnails.items():
+            sizes = {
+                size: Image.open(BytesIO(data)).size for size, data in by_size.items()
+            }
+            self.assertDictEqual(
+                sizes, {640: (400, 400), 320: (320, 320), 160: (160, 160)}
+            )
+            self.assertEqual(Image.open(BytesIO(by_size[160])).format, name.upper())
+
+    def test_connections_are_folded(self):
+        """Test that transitions back and forth make one bidirectional connection."""
+        predictions = [
+            MachineLearningServicePrediction(index=index, time_in=time, time_out=time)
+            for index, time in [(0, 0), (1, 1), (0, 2), (1, 3), (2, 4), (3, 500)]
+        ]
+        self.assertDictEqual(
+            flow_build_service._collect_connections(predictions),
+            {(0, 1): True, (1, 2): False},
+        )
+
+    def test_layout(self):
+        """Test that branches are stacked and deep flows do not hit the recursion limit."""
+        graph = {0: [1, 2], 1: [3], 2: [], 3: [], 4: [5], 5: []}
+        self.assertDictEqual(
+            compute_layout(graph),
+            {0: (0, 0), 1: (1, 0), 3: (2, 0), 2: (1, 1), 4: (0, 2), 5: (1, 2)},
+        )
+        chain = {screen: [screen + 1] for screen in range(10_000)}
+        chain[10_000] = []
+        self.assertEqual(compute_layout(chain)[10_000], (10_000, 0))
+
+    def test_duplicate_frames_are_collapsed(self):
+        """Test that predictions on deduplicated frames resolve to the original frames."""
+        rng = np.random.default_rng(0)
+        screens = [rng.integers(0, 255, (24, 32, 3), dtype=np.uint8) for _ in range(3)]
+        frames = [screens[0]] * 3 + [screens[1]] * 2 + [screens[2]]
+        unique_frames = deduplicate_frames(frames, threshold=5)
+        self.assertListEqual(unique_frames.indices.tolist(), [0, 3, 5])
+
+        predictions = flow_build_service._restore_frame_indices(
+            [MachineLearningServicePrediction(index=1, time_in=2, time_out=2)],
+            unique_frames,
+            interval=2,
+        )
+        self.assertListEqual(
+            predictions,
+            [MachineLearningServicePrediction(index=3, time_in=6, time_out=8)],
+        )
+
+    def test_slow_transition_is_split_into_runs(self):
+        """Test that frames are compared with the first frame of their run."""
+
+        def frame_with_hash_bits(bits: int) -> np.array:
+            # rows of 9 pixels whose first `bits` differences are increases
+            steps = np.where(np.arange(64) < bits, 5, -5).reshape(8, 8)
+            frame = 100 + np.cumsum(np.hstack([np.zeros((8, 1)), steps]), axis=1)
+            return cv2.cvtColor(frame.astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+        frames = [frame_with_hash_bits(bits) for bits in range(13)]
+        unique_frames = deduplicate_frames(frames, threshold=5)
+        self.assertListEqual(unique_frames.indices.tolist(), [0, 6, 12])
+
+    def test_popularity_with_half_life(self):
+        """Test that a first like counts and doubled likes make up for a half-life."""
+        created = date(2025, 1, 1)
+        no_likes, one_like = (
+            compute_popularity(likes, created, half_life_days=30) for likes in (0, 1)
+        )
+        self.assertLess(no_likes, one_like)
+        self.assertAlmostEqual(
+            compute_popularity(3, created, half_life_days=30),
+            compute_popularity(1, created + timedelta(days=30), half_life_days=30),
+        )
+
+
+@locmem_cache
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FlowBuildJobTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="builder", password="abcde", email="test@mail.ru"
+        )
+        self.token = self.user.auth_token.key
+
+    def test_flow_build_is_queued_and_processed(self):
+        """Test that a new flow is built by a worker and its job progress is exposed."""
+        response = self.client.post(
+            reverse("flows"),
+            {"title": "flow", "video": make_test_video(), "interval": 1},
+            headers={"Authorization": f"Token {self.token}"},
+        )
+        self.assertEqual(response.status_code, 202)
+        job_url = reverse("flow_job", args=[response.data["id"]])
+        self.assertEqual(response["Location"], job_url)
+
+        flow = Flow.objects.create(title="flow", author=self.user.profile)
+
+        def create_new_flow(progress, **kwargs):
+            progress(FlowBuildStage.RECOGNIZING, 30)
+            return flow
+
+        with patch.object(flow_build_service, "create_new_flow", create_new_flow):
+            self.assertEqual(flow_job_service.run_worker(burst=True), 1)
+
+        response = self.client.get(
+            job_url, headers={"Authorization": f"Token {self.token}"}
+        )
+        self.assertEqual(response.data["status"], FlowBuildJobStatus.DONE)
+        self.assertEqual(response.data["stage"], FlowBuildStage.FINISHED)
+        self.assertEqual(response.data["flow"], flow.id)
+        self.assertFalse(FlowBuildJob.objects.get().video)
+
+    def enqueue_job(self) -> FlowBuildJob:
+        return flow_job_service.enqueue_flow_build(
+            self.user, make_test_video(), title="flow", interval=1
+        )
+
+    def test_job_error_of_exception_subclass(self):
+        """Test that subclasses of build exceptions fail jobs with their message."""
+
+        class CorruptVideoException(VideoProcessingException):
+            pass
+
+        job = self.enqueue_job()
+        with patch.object(
+            flow_build_service,
+            "create_new_flow",
+            side_effect=CorruptVideoException,
+        ):
+            flow_job_service.run_worker(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, FlowBuildJobStatus.FAILED)
+        self.assertEqual(job.error, str(VideoProcessing.default_detail))
+
+    def test_only_jobs_without_heartbeat_are_requeued(self):
+        """Test that a running job is requeued once its heartbeat is stale."""
+        alive, stale = self.enqueue_job(), self.enqueue_job()
+        now = timezone.now()
+        FlowBuildJob.objects.filter(id=alive.id).update(
+            status=FlowBuildJobStatus.RUNNING, heartbeat_at=now
+        )
+        FlowBuildJob.objects.filter(id=stale.id).update(
+            status=FlowBuildJobStatus.RUNNING,
+            heartbeat_at=now - flow_job_service.stale_after - timedelta(seconds=1),
+        )
+        self.assertEqual(flow_job_service.requeue_stale_jobs(), 1)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, FlowBuildJobStatus.QUEUED)
+
+
+@locmem_cache
+class MLProviderTests(SimpleTestCase):
+    @staticmethod
+    def get_provider(server: MLStubServer, **kwargs) -> MachineLearningServiceProvider:
+        return MachineLearningServiceProvider(
+            "127.0.0.1", server.port, backoff=0, **kwargs
+        )
+
+    @staticmethod
+    def make_screens(count: int) -> List[np.array]:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 256, (24, 32, 3), dtype=np.uint8) for _ in range(count)]
+
+    def test_binary_transport_merges_batches(self):
+        """Test that frames are streamed in batches and predictions are shifted back."""
+        frames = encode_images(self.make_screens(3))
+        with MLStubServer() as server:
+            provider = self.get_provider(server, transport="binary", batch_size=2)
+            predictions = provider.get_direct_graph(frames, images_interval=2)
+            self.assertEqual(server.requests_count, 2)
+        self.assertListEqual(
+            [prediction.index for prediction in predictions], [0, 1, 2]
+        )
+        self.assertEqual(predictions[-1].time_in, 4)
+
+    def test_screen_repeated_across_batches(self):
+        """Test that a screen predicted again in a later batch keeps its index."""
+        first, second = self.make_screens(2)
+        frames = encode_images([first, second, second, first])
+        with MLStubServer() as server:
+            provider = self.get_provider(server, transport="binary", batch_size=2)
+            predictions = provider.get_direct_graph(frames)
+        self.assertListEqual(
+            [prediction.index for prediction in predictions], [0, 1, 0]
+        )
+        self.assertEqual(predictions[1].time_out, 2)
+        self.assertEqual(predictions[2].time_in, 3)
+
+    def test_unavailable_service_is_retried(self):
+        """Test that gateway failures are retried with the same streamed body."""
+        frames = encode_images([np.zeros((24, 32, 3), dtype=np.uint8)] * 2)
+        with MLStubServer(failures=2) as server:
+            provider = self.get_provider(server, transport="binary", retries=2)
+            predictions = provider.get_direct_graph(frames)
+            self.assertEqual(server.requests_count, 3)
+        self.assertEqual(len(predictions), 2)
+        self.assertEqual(provider.get_status()["circuit_state"], "closed")
+
+    def test_circuit_opens_after_failures(self):
+        """Test that the provider fails fast while the ML service is unhealthy."""
+        with MLStubServer(failures=10) as server:
+            provider = self.get_provider(
+                server,
+                retries=0,
+                circuit_breaker=CircuitBreaker(failure_threshold=2),
+            )
+            for _ in range(3):
+                with self.assertRaises(MLServicesUnavailableException):
+                    provider.get_direct_graph([])
+            self.assertEqual(server.requests_count, 2)
+        self.assertEqual(provider.get_status()["circuit_state"], "open")
+
+    def test_status_is_shared_between_processes(self):
+        """Test that the status reported by a worker is seen by other processes."""
+        cache.clear()
+        with MLStubServer(failures=10) as server:
+            worker = self.get_provider(
+                server, retries=0, circuit_breaker=CircuitBreaker(failure_threshold=1)
+            )
+            with self.assertRaises(MLServicesUnavailableException):
+                worker.get_direct_graph([])
+        web = MachineLearningServiceProvider("127.0.0.1", 1)
+        status = web.get_status()
+        self.assertEqual(status["circuit_state"], "open")
+        self.assertEqual(status["consecutive_failures"], 1)
+        self.assertIsNotNone(status["last_latency_ms"])
+
+    def test_local_error_releases_trial(self):
+        """Test that a local error frees the half open trial without a failure."""
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0)
+        breaker.record_failure()
+        breaker.record_failure()
+        provider = MachineLearningServiceProvider(
+            "127.0.0.1", 1, circuit_breaker=breaker
+        )
+
+        def make_body():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            provider._post("/flow", make_body, headers={})
+        self.assertEqual(breaker.failures, 2)
+        self.assertTrue(breaker.allow_request())
+
+
+@locmem_cache
+@override_settings(
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        },
+    },
+)
+class FlowBuildPipelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enterContext(override_settings(MEDIA_ROOT=tempfile.mkdtemp()))
+        self.user = User.objects.create_user(
+            username="builder", password="abcde", email="test@mail.ru"
+        )
+
+    def build_flow(self, screens: List[int], title: str = "flow") -> Flow:
+        with MLStubServer() as server, patch.object(
+            ml_service_provider, "ml_service_url", f"http://127.0.0.1:{server.port}"
+        ):
+            return flow_build_service.create_new_flow(
+                title=title,
+                video_file=make_test_video(screens=screens),
+                user=self.user,
+                interval=1,
+            )
+
+    def test_screens_are_uploaded_and_connected(self):
+        """Test that every recognized screen is stored with its image and connected."""
+        flow = self.build_flow([1, 2, 1, 3])
+        screens = list(flow.screens.order_by("flow_screen_number"))
+        self.assertListEqual(
+            [screen.flow_screen_number for screen in screens], [0, 1, 2, 3]
+        )
+        self.assertEqual(screens[1].image.name, "screens/flow_01_01.jpeg")
+        self.assertTrue(screens[1].image.storage.exists(screens[1].image.name))
+        self.assertEqual(Image.open(screens[1].image).size, (32, 24))
+        self.assertEqual(Connection.objects.filter(screen_out__flow=flow).count(), 3)
+        self.assertListEqual(
+            [(screen.position_x, screen.position_y) for screen in screens],
+            [(0, 0), (1, 0), (2, 0), (3, 0)],
+        )
+
+    def test_screen_image_levels(self):
+        """Test that screens are stored with their levels and old screens are backfilled."""
+        flow = self.build_flow([1, 2])
+        Flow.objects.filter(id=flow.id).update(status=FlowStatus.VERIFIED)
+        screen = flow.screens.get(flow_screen_number=0)
+        self.assertListEqual(list(screen.image_levels), ["half", "quarter"])
+        half = Image.open(screen.image.storage.open(screen.image_levels["half"]))
+        self.assertEqual(half.size, (16, 12))
+
+        Screen.objects.filter(flow=flow).update(image_levels={})
+        self.client.get(reverse("flow", args=[flow.id]))
+        out = StringIO()
+        call_command("build_screen_levels", stdout=out)
+        self.assertIn("Built levels of 2 screens", out.getvalue())
+        levels = self.client.get(reverse("flow", args=[flow.id])).data["screens"][0][
+            "image_levels"
+        ]
+        self.assertListEqual(list(levels), ["full", "half", "quarter", "preview"])
+        self.assertTrue(levels["full"].endswith("/screens/flow_01_00.jpeg"))
+        self.assertIn("/screens/flow_01_00_quarter", levels["quarter"])
+        self.assertEqual(levels["preview"], levels["quarter"])
+
+    def test_thumbnail_derivatives_are_listed(self):
+        """Test that a flow thumbnail is stored with derivatives listed by format and size."""
+        thumbnail = BytesIO()
+        Image.new("RGBA", (300, 200), (0, 0, 255, 128)).save(thumbnail, format="PNG")
+        with MLStubServer() as server, patch.object(
+            ml_service_provider, "ml_service_url", f"http://127.0.0.1:{server.port}"
+        ):
+            flow = flow_build_service.create_new_flow(
+                title="flow",
+                video_file=make_test_video(screens=[1, 2]),
+                user=self.user,
+                thumbnail_file=SimpleUploadedFile("thumb.png", thumbnail.getvalue()),
+            )
+        self.assertEqual(flow.thumbnails["webp"]["160"], "flows/flow_01_160.webp")
+        storage = flow.flow_thumbnail_url.storage
+        self.assertEqual(
+            Image.open(storage.open("flows/flow_01_320.jpeg")).size, (200, 200)
+        )
+
+        response = self.client.get(reverse("flows"))
+        thumbnails = response.data["results"][0]["thumbnails"]
+        self.assertListEqual(sorted(thumbnails["jpeg"]), ["160", "320", "640"])
+        self.assertTrue(thumbnails["webp"]["640"].endswith("/flows/flow_01_640.webp"))
+
+    def test_build_queries_do_not_depend_on_screens(self):
+        """Test that the number of database queries is the same for short and long flows."""
+        self.build_flow([1, 2])
+        with CaptureQueriesContext(connection) as short_flow_queries:
+            self.build_flow([1, 2, 3])
+        with CaptureQueriesContext(connection) as long_flow_queries:
+            self.build_flow([1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(len(short_flow_queries), len(long_flow_queries))
+
+    def test_detail_queries_do_not_depend_on_screens(self):
+        """Test that a flow detail is rendered with the same queries for any graph size."""
+        commenter = User.objects.create_user(username="commenter", password="abcde")
+        queries = []
+        for screens in ([1, 2], [1, 2, 3, 1, 4, 5, 2]):
+            flow = self.build_flow(screens, title=f"flow{len(screens)}")
+            Flow.objects.filter(id=flow.id).update(status=FlowStatus.VERIFIED)
+            flow_social_service.comment_flow(flow, commenter, "text")
+            flow_social_service.comment_flow(flow, self.user, "text")
+            with CaptureQueriesContext(connection) as detail_queries:
+                response = self.client.get(reverse("flow", args=[flow.id]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["max_x"], len(screens) - 1)
+            queries.append(len(detail_queries))
+        self.assertEqual(queries[0], queries[1])
+
+
+@locmem_cache
+class FlowSocialTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user1", password="abcde", email="test@mail.ru"
+        )
+        self.auth = {"Authorization": f"Token {self.user.auth_token.key}"}
+        self.flow = Flow.objects.create(
+            title="flow", author=self.user.profile, status=FlowStatus.VERIFIED
+        )
+
+    def test_like_counter(self):
+        """Test that likes are counted on the flow without scanning likes."""
+        url = reverse("likes", args=[self.flow.id])
+        response = self.client.post(url, headers=self.auth)
+        self.assertEqual(response.data["total_likes"], 1)
+        response = self.client.post(url, headers=self.auth)
+        self.assertEqual(response.data["total_likes"], 1)
+        response = self.client.delete(url, headers=self.auth)
+        self.assertEqual(response.data["total_likes"], 0)
+
+    def test_comment_counter(self):
+        url = reverse("comments", args=[self.flow.id])
+        self.client.post(url, {"text": "nice"}, headers=self.auth)
+        self.flow.refresh_from_db()
+        self.assertEqual(self.flow.comments_count, 1)
+
+    def test_reconcile_counters(self):
+        """Test that drifted counters are repaired in bulk."""
+        Like.objects.create(flow=self.flow, user=self.user.profile)
+        Flow.objects.filter(id=self.flow.id).update(comments_count=5)
+        call_command("reconcile_flow_counters", stdout=StringIO())
+        self.flow.refresh_from_db()
+        self.assertEqual(self.flow.likes_count, 1)
+        self.assertEqual(self.flow.comments_count, 0)
+
+
+@locmem_cache
+class FlowCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="user1", password="abcde", email="test@mail.ru"
+        )
+        self.flow = Flow.objects.create(
+            title="flow", author=self.user.profile, status=FlowStatus.VERIFIED
+        )
+        Screen.objects.create(flow=self.flow, flow_screen_number=0, position_x=2)
+
+    def get_detail(self) -> dict:
+        response = self.client.get(reverse("flow", args=[self.flow.id]))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_detail_is_served_from_cache(self):
+        """Test that a cached detail is served without queries until the flow changes."""
+        self.get_detail()
+        with self.assertNumQueries(0):
+            data = self.get_detail()
+        self.assertEqual(data["max_x"], 2)
+        self.assertFalse(data["is_liked"])
+        for internal_field in ("popularity", "comments_count", "search_vector"):
+            self.assertNotIn(internal_field, data)
+
+        Screen.objects.create(flow=self.flow, flow_screen_number=1, position_x=5)
+        self.assertEqual(self.get_detail()["max_x"], 5)
+
+    def test_social_part_is_invalidated(self):
+        """Test that likes and comments replace only the social part of a cached detail."""
+        self.get_detail()
+        flow_social_service.like_flow(self.flow, self.user)
+        flow_social_service.comment_flow(self.flow, self.user, "text")
+        # the flow with its likes count and the comments with their authors
+        with self.assertNumQueries(2):
+            data = self.get_detail()
+        self.assertEqual(data["total_likes"], 1)
+        self.assertEqual(len(data["comments"]), 1)
+        self.assertEqual(data["max_x"], 2)
+        self.client.force_authenticate(self.user)
+        self.assertTrue(self.get_detail()["is_liked"])
+
+    def test_detail_conditional_request(self):
+        """Test that detail validators change with likes and differ between users."""
+        url = reverse("flow", args=[self.flow.id])
+        # validators are given once the detail is cached
+        self.assertNotIn("ETag", self.client.get(url))
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        flow_social_service.like_flow(self.flow, self.user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)["ETag"]
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["is_liked"])
+
+    def test_validators_need_a_visible_flow(self):
+        """Test that missing and private flows are never answered with 304."""
+        future = "Fri, 01 Jan 2100 00:00:00 GMT"
+        url = reverse("flow", args=[self.flow.id + 1])
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=future)
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(
+            flow_cache_service.get_versions(self.flow.id + 1, start_missing=False)
+        )
+
+        Flow.objects.filter(id=self.flow.id).update(visibility=FlowVisibility.PRIVATE)
+        url = reverse("flow", args=[self.flow.id])
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=future)
+        self.assertEqual(response.status_code, 403)
+
+    def test_private_flow_is_not_cached(self):
+        """Test that details visible only to their author never reach the cache."""
+        Flow.objects.filter(id=self.flow.id).update(visibility=FlowVisibility.PRIVATE)
+        self.client.force_authenticate(self.user)
+        self.get_detail()
+        versions = flow_cache_service.get_versions(self.flow.id)
+        self.assertFalse(flow_cache_service.get_parts(self.flow.id, versions))
+
+    def test_cached_token_authentication(self):
+        """Test that cached tokens authenticate without queries until they change."""
+        token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        flow_social_service.like_flow(self.flow, self.user)
+        for _ in range(2):
+            self.get_detail()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.get_detail()["is_liked"])
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse("flow", args=[self.flow.id]))
+        self.assertEqual(response.status_code, 401)
+        token.delete()
+        response = self.client.get(reverse("flow", args=[self.flow.id]))
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_tokens_leave_no_versions(self):
+        """Test that rejected tokens start no version in the cache."""
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + "0" * 40)
+        self.assertEqual(self.client.get(reverse("my_flows")).status_code, 401)
+        self.assertIsNone(version_service.get_started("token:" + "0" * 40))
+
+    def test_token_revoked_by_another_process(self):
+        """Test that locally cached tokens are checked against the shared version."""
+        token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.assertEqual(self.client.get(reverse("my_flows")).status_code, 200)
+
+        # another process deletes the token, only the shared cache sees it
+        Token.objects.filter(key=token.key).delete()
+        version_service.bump(f"token:{token.key}")
+        self.assertEqual(self.client.get(reverse("my_flows")).status_code, 401)
+
+
+@locmem_cache
+class FlowListTests(APITestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f"user{i}", password="abcde", email="test@mail.ru"
+            )
+            for i in range(3)
+        ]
+        self.flows = [
+            Flow.objects.create(
+                title=f"flow{i}",
+                author=self.users[0].profile,
+                status=FlowStatus.VERIFIED,
+            )
+            for i in range(3)
+        ]
+
+    def like(self, flow: Flow, likes: int) -> None:
+        for user in self.users[:likes]:
+            flow_social_service.like_flow(flow, user)
+
+    def test_sort_by_likes(self):
+        """Test that public flows are ranked by popularity without duplicates."""
+        self.like(self.flows[1], 2)
+        self.like(self.flows[2], 1)
+        response = self.client.get(reverse("flows"), {"sort": "likes"})
+        self.assertListEqual(
+            [flow["id"] for flow in response.data["results"]],
+            [self.flows[1].id, self.flows[2].id, self.flows[0].id],
+        )
+
+    def test_new_flow_popularity(self):
+        """Test that flows created outside the build service get their initial popularity."""
+        with patch(
+            "apps.interface_flows_api.signals.compute_popularity",
+            partial(compute_popularity, half_life_days=30),
+        ):
+            flow = Flow.objects.create(title="new", author=self.users[0].profile)
+        flow.refresh_from_db()
+        self.assertGreater(flow.popularity, 0)
+        self.assertAlmostEqual(
+            flow.popularity, compute_popularity(0, flow.date, half_life_days=30)
+        )
+
+    def walk_cursor_pages(self, url: str, params: dict) -> List[int]:
+        ids = []
+        response = self.client.get(
+            url, {**params, "pagination": "cursor", "page_size": 2}
+        )
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            ids += [flow["id"] for flow in response.data["results"]]
+            if response.data["next"] is None:
+                return ids
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_pagination(self):
+        """Test that cursor pages of every listing follow its ordering without gaps."""
+        self.like(self.flows[1], 2)
+        self.like(self.flows[2], 1)
+        expected = [self.flows[1].id, self.flows[2].id, self.flows[0].id]
+        self.assertListEqual(
+            self.walk_cursor_pages(reverse("flows"), {"sort": "likes"}), expected
+        )
+
+        newest_first = [flow.id for flow in reversed(self.flows)]
+        self.client.force_authenticate(self.users[0])
+        self.assertListEqual(
+            self.walk_cursor_pages(reverse("my_flows"), {}), newest_first
+        )
+        self.assertListEqual(
+            self.walk_cursor_pages(reverse("liked_flows"), {}),
+            [self.flows[2].id, self.flows[1].id],
+        )
+
+    def test_cursor_pagination_total(self):
+        """Test that the total is only counted on request and bad cursors are rejected."""
+        response = self.client.get(
+            reverse("flows"), {"pagination": "cursor", "with_total": "1"}
+        )
+        self.assertEqual(response.data["count"], 3)
+        response = self.client.get(reverse("flows"), {"cursor": "broken"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor(self):
+        """Test that a well-formed cursor with values of wrong types is rejected."""
+        ordering = [("date", True), ("id", True)]
+        for values in (["x", "y"], [None, 1], ["2024-01-01", [1]]):
+            with self.subTest(values=values):
+                cursor = KeysetPagination.encode_cursor(ordering, values)
+                response = self.client.get(reverse("flows"), {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+        cursor = KeysetPagination.encode_cursor(ordering, ["2999-01-01", 10**6])
+        response = self.client.get(reverse("flows"), {"cursor": cursor})
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def add_flows(self, count: int) -> None:
+        genre, _ = Genre.objects.get_or_create(name="genre")
+        platform, _ = Platform.objects.get_or_create(name="platform")
+        for i in range(count):
+            flow = Flow.objects.create(
+                title=f"extra{i}",
+                author=self.users[0].profile,
+                status=FlowStatus.VERIFIED,
+            )
+            flow.genres.add(genre)
+            flow.platforms.add(platform)
+            self.like(flow, 1)
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        """Test that every listing renders a page with a constant number of queries."""
+        self.client.force_authenticate(self.users[0])
+        # flows, genres, platforms; plus the count of page number pagination
+        endpoints = [
+            (reverse("flows"), 4),
+            (reverse("flows") + "?pagination=cursor", 3),
+            (reverse("my_flows"), 3),
+            (reverse("liked_flows"), 3),
+        ]
+        for flows_count in (1, 5):
+            self.add_flows(flows_count)
+            for url, queries in endpoints:
+                with self.subTest(url=url, flows_count=flows_count):
+                    with self.assertNumQueries(queries):
+                        self.client.get(url)
+
+    def test_genre_filter_match(self):
+        """Test that flows match any or all of the requested genres."""
+        action, puzzle = Genre.objects.create(name="action"), Genre.objects.create(
+            name="puzzle"
+        )
+        self.flows[0].genres.add(action)
+        self.flows[1].genres.add(action, puzzle)
+        params = {"genre": ["action", "puzzle"], "order": "asc"}
+        for genre_match, expected in (
+            ("any", [self.flows[0].id, self.flows[1].id]),
+            ("all", [self.flows[1].id]),
+        ):
+            with self.subTest(genre_match=genre_match):
+                response = self.client.get(
+                    reverse("flows"), {**params, "genre_match": genre_match}
+                )
+                self.assertListEqual(
+                    [flow["id"] for flow in response.data["results"]], expected
+                )
+        response = self.client.get(reverse("flows"), {"genre": "unknown"})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_search(self):
+        """Test that search ranks title matches first and pages by cursor."""
+        Flow.objects.filter(id=self.flows[0].id).update(title="Dark Souls menus")
+        self.flows[1].title = "Souls like inventory"
+        self.flows[1].save()
+        self.flows[2].source = "dark souls remaster"
+        self.flows[2].save()
+        response = self.client.get(
+            reverse("search_flows"), {"q": "dark soul", "page_size": 1}
+        )
+        ids = [flow["id"] for flow in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            ids += [flow["id"] for flow in response.data["results"]]
+        self.assertListEqual(ids, [self.flows[0].id, self.flows[2].id])
+
+        response = self.client.get(reverse("search_flows"), {"q": " "})
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(connection.vendor == "postgresql", "ranks are computed by PostgreSQL")
+    def test_search_cursor_over_tied_ranks(self):
+        """Test that search pages keep rows with tied and inexact ranks exactly once."""
+        titles = ["dark soul", "dark souls", "the dark soul", "soul of the dark"] * 3
+        flows = [
+            Flow.objects.create(
+                title=title, author=self.users[0].profile, status=FlowStatus.VERIFIED
+            )
+            for title in titles
+        ]
+        ids = self.walk_cursor_pages(reverse("search_flows"), {"q": "dark soul"})
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertTrue({flow.id for flow in flows} <= set(ids))
+
+
+@locmem_cache
+class AsyncReadViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+        self.user = User.objects.create_user(
+            username="user1", password="abcde", email="test@mail.ru"
+        )
+        self.auth = f"Token {Token.objects.get(user=self.user).key}"
+        self.flows = [
+            Flow.objects.create(
+                title=f"flow{i}", author=self.user.profile, status=FlowStatus.VERIFIED
+            )
+            for i in range(3)
+        ]
+        Screen.objects.create(flow=self.flows[0], flow_screen_number=0, position_x=2)
+        self.private_flow = Flow.objects.create(
+            title="private", author=self.user.profile
+        )
+        flow_social_service.like_flow(self.flows[0], self.user)
+
+    async def call(self, view_class, path: str, data=None, method="get", **kwargs):
+        headers = {"Authorization": kwargs.pop("auth")} if "auth" in kwargs else {}
+        request = getattr(self.factory, method)(path, data, headers=headers)
+        return await view_class.as_view()(request, **kwargs)
+
+    def test_listing_without_queryset_is_rejected(self):
+        """Test that an async listing has to define where its flows come from."""
+        with self.assertRaises(TypeError):
+
+            class BrokenListView(AsyncListView):
+                pass
+
+    async def test_flow_list(self):
+        """Test that the async listing pages and validates like the sync one."""
+        response = await self.call(AsyncFlowView, "/flows/", {"page_size": 2})
+        data = json.loads(response.content)
+        self.assertEqual(data["count"], 3)
+        self.assertListEqual(
+            [flow["id"] for flow in data["results"]],
+            [self.flows[2].id, self.flows[1].id],
+        )
+        response = await self.call(
+            AsyncFlowView, "/flows/", {"pagination": "cursor"}, auth=self.auth
+        )
+        results = json.loads(response.content)["results"]
+        self.assertListEqual(
+            [flow["is_liked"] for flow in results], [False, False, True]
+        )
+        request = self.factory.get(
+            "/flows/",
+            headers={"Authorization": self.auth, "If-None-Match": response["ETag"]},
+        )
+        response = await AsyncFlowView.as_view()(request)
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.call(
+            AsyncFlowView, "/flows/", method="post", auth=self.auth
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_flow_detail(self):
+        """Test that the async detail is cached and checks access and authentication."""
+        for _ in range(2):
+            response = await self.call(
+                AsyncFlowDetailView, "/flows/", pk=self.flows[0].id, auth=self.auth
+            )
+            data = json.loads(response.content)
+            self.assertEqual(data["max_x"], 2)
+            self.assertTrue(data["is_liked"])
+        response = await self.call(
+            AsyncFlowDetailView, "/flows/", pk=self.private_flow.id
+        )
+        self.assertEqual(response.status_code, 403)
+        response = await self.call(
+            AsyncFlowDetailView, "/flows/", pk=self.flows[0].id, auth="Token wrong"
+        )
+        self.assertEqual(response.status_code, 401)
+        response = await self.call(AsyncMyFlowView, "/flows/my/")
+        self.assertEqual(response.status_code, 401)
+        response = await self.call(AsyncMyFlowView, "/flows/my/", auth=self.auth)
+        self.assertEqual(len(json.loads(response.content)), 4)
+
+
+@locmem_cache
+class UserProvisioningTests(APITestCase):
+    def test_users_created_concurrently_are_skipped(self):
+        """Test that usernames taken after the existence check are skipped."""
+
+        def hash_passwords(passwords, processes):
+            # another import creates one of the users while passwords are hashed
+            User.objects.create_user(username="user1", password="abcde")
+            return ["!"] * len(passwords)
+
+        users = [{"username": f"user{i}", "password": "abcde"} for i in range(3)]
+        with patch.object(auth_service, "hash_passwords", hash_passwords):
+            result = auth_service.bulk_create_users(users)
+        self.assertDictEqual(result, {"created": 2, "skipped": 1})
+        self.assertEqual(Profile.objects.count(), 3)
+
+    def test_create_users_command(self):
+        """Test that bulk created users get profiles, tokens and usable passwords."""
+        User.objects.create_user(username="user0", password="abcde")
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as file:
+            file.write("username,email,password\n")
+            for i in range(5):
+                file.write(f"user{i},user{i}@Mail.ru,password{i}\n")
+            file.flush()
+            out = StringIO()
+            call_command(
+                "create_users", file.name, "--batch-size=2", "--processes=2", stdout=out
+            )
+        self.assertIn("Created 4 users, skipped 1", out.getvalue())
+        self.assertEqual(Profile.objects.count(), 5)
+        self.assertEqual(Token.objects.count(), 5)
+        self.assertEqual(User.objects.get(username="user4").email, "user4@mail.ru")
+
+        response = self.client.post(
+            reverse("login"), {"username": "user3", "password": "password3"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["token"], Token.objects.get(user__username="user3").key
+        )
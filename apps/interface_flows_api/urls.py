@@ -1,16 +1,33 @@
 from django.urls import path
 
+import apps.interface_flows_api.config as config
 from apps.interface_flows_api.views import *
 
+if config.ASYNC_READ_VIEWS:
+    from apps.interface_flows_api.async_views import \
+        AsyncFlowDetailView as FlowDetailView
+    from apps.interface_flows_api.async_views import AsyncFlowView as FlowView
+    from apps.interface_flows_api.async_views import \
+        AsyncGenresView as GenresView
+    from apps.interface_flows_api.async_views import \
+        AsyncLikedFlowView as LikedFlowView
+    from apps.interface_flows_api.async_views import \
+        AsyncMyFlowView as MyFlowView
+    from apps.interface_flows_api.async_views import \
+        AsyncPlatformsView as PlatformsView
+
 urlpatterns = [
     path("genres/", GenresView.as_view(), name="genres"),
     path("platforms/", PlatformsView.as_view(), name="platforms"),
     path("flows/", FlowView.as_view(), name="flows"),
     path("flows/liked/", LikedFlowView.as_view(), name="liked_flows"),
     path("flows/my/", MyFlowView.as_view(), name="my_flows"),
+    path("flows/search/", FlowSearchView.as_view(), name="search_flows"),
+    path("flows/jobs/<int:pk>/", FlowBuildJobView.as_view(), name="flow_job"),
     path("flows/<int:pk>/", FlowDetailView.as_view(), name="flow"),
     path("flows/<int:pk>/likes/", FlowLikeView.as_view(), name="likes"),
     path("flows/<int:pk>/comments/", FlowCommentView.as_view(), name="comments"),
+    path("ml/status/", MLServiceStatusView.as_view(), name="ml_status"),
     path("auth/signup/", CreateUserView.as_view(), name="signup"),
     path("auth/token/", CustomObtainAuthToken.as_view(), name="login"),
 ]
@@ -0,0 +1,60 @@
+import enum
+import threading
+import time
+
+
+class CircuitState(enum.Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive failures.
+    Once `recovery_timeout` seconds pass a single trial call is let through to probe the service.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        if self.opened_at is None:
+            return CircuitState.closed
+        if time.monotonic() - self.opened_at >= self.recovery_timeout:
+            return CircuitState.half_open
+        return CircuitState.open
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == CircuitState.closed:
+                return True
+            if state == CircuitState.half_open and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def release_trial(self) -> None:
+        """End a trial call that failed for reasons other than the service."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
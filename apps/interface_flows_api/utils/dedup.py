@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import cv2
+import numpy as np
+
+HASH_SIZE = 8
+
+
+@dataclass
+class DeduplicatedFrames:
+    """Positions of the frames kept after deduplication and the runs they stand for."""
+
+    indices: np.array
+    run_ends: np.array
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def original_index(self, index: int) -> int:
+        return int(self.indices[min(index, len(self.indices) - 1)])
+
+    def original_run_end(self, index: int) -> int:
+        return int(self.run_ends[min(index, len(self.run_ends) - 1)])
+
+
+def dhash(frames: Iterable[np.array], hash_size: int = HASH_SIZE) -> np.array:
+    """Difference hashes of BGR frames packed into `hash_size` bytes per frame."""
+    thumbnails = np.stack(
+        [
+            cv2.resize(
+                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
+                (hash_size + 1, hash_size),
+                interpolation=cv2.INTER_AREA,
+            )
+            for frame in frames
+        ]
+    )
+    bits = thumbnails[:, :, 1:] > thumbnails[:, :, :-1]
+    return np.packbits(bits.reshape(len(thumbnails), -1), axis=1)
+
+
+def hamming_distances_to(hashes: np.array, frame_hash: np.array) -> np.array:
+    """Hamming distance between every hash and `frame_hash`."""
+    return np.unpackbits(hashes ^ frame_hash, axis=1).sum(axis=1)
+
+
+def deduplicate_frames(
+    frames: Iterable[np.array], threshold: int
+) -> DeduplicatedFrames:
+    """
+    Collapse runs of near-identical frames into their first frame.
+    Frames whose hash differs from the first frame of the current run by at most
+    `threshold` bits join the run, so slow transitions do not drift into one run.
+    """
+    hashes = dhash(frames)
+    keep = np.zeros(len(hashes), dtype=bool)
+    representative = None
+    for index, frame_hash in enumerate(hashes):
+        code = int.from_bytes(frame_hash.tobytes(), "big")
+        if representative is None or (code ^ representative).bit_count() > threshold:
+            keep[index] = True
+            representative = code
+    indices = np.flatnonzero(keep)
+    run_ends = np.append(indices[1:] - 1, len(hashes) - 1)
+    return DeduplicatedFrames(indices=indices, run_ends=run_ends)
@@ -1,14 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from typing import List, Sequence
 
 import numpy as np
 from PIL import Image
 
+import apps.interface_flows_api.config as config
+
 
 def numpy_array_to_io(image_np: np.array, img_format="JPEG") -> BytesIO:
-    # convert BGR to RGB
-    image_np = image_np[:, :, ::-1]
-    # create a file from correct array
-    image = Image.fromarray(image_np.astype(np.uint8))
+    # read BGR bytes as RGB directly instead of copying a reversed array
+    image_np = np.ascontiguousarray(image_np, dtype=np.uint8)
+    height, width = image_np.shape[:2]
+    image = Image.frombuffer("RGB", (width, height), image_np, "raw", "BGR", 0, 1)
     buffered = BytesIO()
     image.save(buffered, format=img_format)
     return buffered
+
+
+def numpy_array_to_bytes(image_np: np.array, img_format="JPEG") -> bytes:
+    return numpy_array_to_io(image_np, img_format).getvalue()
+
+
+def encode_images(
+    images: Sequence[np.array],
+    img_format="JPEG",
+    max_workers: int = config.ENCODER_WORKERS,
+) -> List[bytes]:
+    """Encode images concurrently, Pillow releases the GIL while encoding."""
+    if len(images) <= 1:
+        return [numpy_array_to_bytes(image, img_format) for image in images]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as pool:
+        return list(
+            pool.map(lambda image: numpy_array_to_bytes(image, img_format), images)
+        )
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import apps.interface_flows_api.config as config
+from apps.interface_flows_api.utils.encoder import encode_images
+
+
+def fit_to_width(frame: np.array, width: Optional[int]) -> np.array:
+    """Downscale a frame to the given width keeping its aspect ratio."""
+    height, current_width = frame.shape[:2]
+    if not width or current_width <= width:
+        return frame
+    size = (width, max(round(height * width / current_width), 1))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+class FrameStore:
+    """
+    Sampled video frames kept in one preallocated contiguous array.
+    Stores bigger than `spill_bytes` are backed by a memory-mapped temporary file.
+    JPEG images of the frames are cached up to `encoded_cache_bytes`.
+    """
+
+    def __init__(
+        self,
+        frame_shape: Tuple[int, ...],
+        capacity: int,
+        spill_bytes: int = config.FRAME_STORE_SPILL_BYTES,
+        ml_width: Optional[int] = config.ML_FRAME_WIDTH,
+        encoded_cache_bytes: int = config.FRAME_ENCODED_CACHE_BYTES,
+        encode_batch_size: int = config.FRAME_ENCODE_BATCH_SIZE,
+    ):
+        self.frame_shape = tuple(frame_shape)
+        self.spill_bytes = spill_bytes
+        self.ml_width = ml_width
+        self.encoded_cache_bytes = encoded_cache_bytes
+        self.encode_batch_size = encode_batch_size
+        self._length = 0
+        self._spill_file = None
+        self._encoded = {}
+        self._encoded_bytes = 0
+        self._frames = self._allocate(max(capacity, 1))
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: Iterable[np.array],
+        capacity: int,
+        screen_width: Optional[int] = config.SCREEN_MAX_WIDTH,
+        **kwargs,
+    ) -> FrameStore:
+        store = None
+        try:
+            for frame in frames:
+                frame = fit_to_width(frame, screen_width)
+                if store is None:
+                    store = cls(frame.shape, capacity, **kwargs)
+                store.append(frame)
+        except BaseException:
+            # a spilled store would leave its temporary file behind
+            if store is not None:
+                store.close()
+            raise
+        if store is None:
+            raise ValueError("No frames were extracted")
+        return store
+
+    def _allocate(self, capacity: int) -> np.array:
+        shape = (capacity, *self.frame_shape)
+        if capacity * int(np.prod(self.frame_shape)) <= self.spill_bytes:
+            return np.empty(shape, dtype=np.uint8)
+        self._spill_file = tempfile.NamedTemporaryFile(suffix=".frames", delete=False)
+        return np.memmap(self._spill_file.name, dtype=np.uint8, mode="w+", shape=shape)
+
+    def _grow(self) -> None:
+        frames, spill_file = self._frames, self._spill_file
+        self._spill_file = None
+        self._frames = self._allocate(len(frames) * 2)
+        self._frames[: self._length] = frames[: self._length]
+        self._release(spill_file)
+
+    @staticmethod
+    def _release(spill_file) -> None:
+        # the mapping itself is dropped with the last array view referencing it
+        if spill_file is not None:
+            spill_file.close()
+            os.unlink(spill_file.name)
+
+    def append(self, frame: np.array) -> None:
+        if frame.shape != self.frame_shape:
+            raise ValueError(
+                f"Frame of shape {frame.shape} does not fit the store {self.frame_shape}"
+            )
+        if self._length == len(self._frames):
+            self._grow()
+        self._frames[self._length] = frame
+        self._length += 1
+
+    def close(self) -> None:
+        self._release(self._spill_file)
+        self._frames, self._spill_file, self._length = None, None, 0
+        self.forget_encoded()
+
+    def __enter__(self) -> FrameStore:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> np.array:
+        if not -self._length <= index < self._length:
+            raise IndexError("Frame index out of range")
+        return self._frames[index % self._length]
+
+    def __iter__(self) -> Iterator[np.array]:
+        for index in range(self._length):
+            yield self._frames[index]
+
+    @property
+    def spilled(self) -> bool:
+        return self._spill_file is not None
+
+    @property
+    def screen_size(self) -> (int, int):
+        height, width = self.frame_shape[:2]
+        return width, height
+
+    def encode(self, indices: Iterable[int]) -> List[bytes]:
+        """JPEG images of the given frames, cached frames are not encoded again."""
+        indices = [int(index) for index in indices]
+        missing = list(dict.fromkeys(i for i in indices if i not in self._encoded))
+        encoded = dict(zip(missing, encode_images([self[index] for index in missing])))
+        for index, image in encoded.items():
+            if self._encoded_bytes + len(image) <= self.encoded_cache_bytes:
+                self._encoded[index] = image
+                self._encoded_bytes += len(image)
+        return [
+            encoded[index] if index in encoded else self._encoded[index]
+            for index in indices
+        ]
+
+    def forget_encoded(self) -> None:
+        """Drop the cached JPEG images, e.g. once the screens are uploaded."""
+        self._encoded, self._encoded_bytes = {}, 0
+
+    def ml_frames(self, indices: Iterable[int] = None) -> Iterator[np.array]:
+        """Frames downscaled to the resolution used for ML inference."""
+        frames = self if indices is None else (self[index] for index in indices)
+        for frame in frames:
+            yield fit_to_width(frame, self.ml_width)
+
+    def ml_images(self, indices: Iterable[int] = None) -> Iterator[bytes]:
+        """
+        JPEG images for ML inference, encoded in batches as they are consumed.
+        Without a separate inference resolution they are shared with the stored screens.
+        """
+        indices = iter(range(self._length) if indices is None else indices)
+        while batch := list(islice(indices, self.encode_batch_size)):
+            if self.ml_width is None:
+                yield from self.encode(batch)
+            else:
+                yield from encode_images(list(self.ml_frames(batch)))
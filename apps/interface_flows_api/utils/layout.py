@@ -0,0 +1,56 @@
+import heapq
+from typing import Dict, Hashable, List, Tuple
+
+Graph = Dict[Hashable, List[Hashable]]
+Position = Tuple[int, int]
+
+_done = object()
+
+
+def _place_tree(graph: Graph, positions: Dict[Hashable, Position], root, y: int) -> int:
+    """
+    Depth-first placement of everything reachable from `root` starting at row `y`.
+    Every next depth level moves one column right, every branch after the first one
+    starts one row below the last row used by its siblings. Returns the last used row.
+    """
+    positions[root] = (0, y)
+    # frame: node, column, current row, neighbours iterator, number of placed children
+    stack = [[root, 0, y, iter(graph.get(root, ())), 0]]
+    while True:
+        frame = stack[-1]
+        node, x, row, neighbours, placed = frame
+        neighbour = next(neighbours, _done)
+        if neighbour is _done:
+            stack.pop()
+            if not stack:
+                return row
+            parent = stack[-1]
+            parent[2] = row
+            parent[4] += 1
+            continue
+        if neighbour in positions:
+            continue
+        next_row = row + 1 if placed > 0 else row
+        positions[neighbour] = (x + 1, next_row)
+        stack.append([neighbour, x + 1, next_row, iter(graph.get(neighbour, ())), 0])
+
+
+def compute_layout(graph: Graph) -> Dict[Hashable, Position]:
+    """
+    Grid positions (x, y) for every node of an adjacency mapping.
+    Trees are rooted at the unplaced node with the most neighbours (ties go to the earlier
+    node) and stacked below each other.
+    """
+    roots = [
+        (-len(neighbours), order, node)
+        for order, (node, neighbours) in enumerate(graph.items())
+    ]
+    heapq.heapify(roots)
+    positions = {}
+    y = 0
+    while roots:
+        _, _, root = heapq.heappop(roots)
+        if root in positions:
+            continue
+        y = _place_tree(graph, positions, root, y) + 1
+    return positions
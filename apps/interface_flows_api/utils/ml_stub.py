@@ -0,0 +1,107 @@
+"""
+Local stand-in for the ML service implementing the /flow and /flow/stream endpoints.
+Every received image is predicted as a separate screen. Run it with
+`python -m apps.interface_flows_api.utils.ml_stub <port>`.
+"""
+
+import json
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MLStubRequestHandler(BaseHTTPRequestHandler):
+    server: "MLStubServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = bytearray()
+        while True:
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            if size == 0:
+                self.rfile.readline()
+                return bytes(body)
+            body += self.rfile.read(size)
+            self.rfile.readline()
+
+    @staticmethod
+    def _count_binary_frames(body: bytes) -> int:
+        count, position = 0, 0
+        while position < len(body):
+            (size,) = struct.unpack(">I", body[position : position + 4])
+            position += 4 + size
+            count += 1
+        return count
+
+    def _send_json(self, status: int, data) -> None:
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = self._read_body()
+        self.server.requests_count += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if self.server.failures_left > 0:
+            self.server.failures_left -= 1
+            self._send_json(503, {"detail": "unavailable"})
+            return
+
+        if self.path == "/flow":
+            data = json.loads(body)
+            images_count = len(data["encoded_images"])
+            interval = data["images_interval"]
+        elif self.path == "/flow/stream":
+            images_count = self._count_binary_frames(body)
+            interval = int(self.headers["X-Images-Interval"])
+        else:
+            self._send_json(404, {"detail": "not found"})
+            return
+
+        predictions = [
+            {"index": i, "time_in": i * interval, "time_out": i * interval}
+            for i in range(images_count)
+        ]
+        self._send_json(200, predictions)
+
+
+class MLStubServer(ThreadingHTTPServer):
+    """Stub ML service, the first `failures` requests are answered with 503."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, failures: int = 0, delay: float = 0):
+        super().__init__(("127.0.0.1", port), MLStubRequestHandler)
+        self.failures_left = failures
+        self.delay = delay
+        self.requests_count = 0
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self) -> "MLStubServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    server = MLStubServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8001)
+    print(f"ML stub service is listening on port {server.port}")
+    server.serve_forever()
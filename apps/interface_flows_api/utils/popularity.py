@@ -0,0 +1,21 @@
+import math
+from datetime import date
+
+import apps.interface_flows_api.config as config
+
+POPULARITY_EPOCH = date(2024, 1, 1)
+
+
+def compute_popularity(
+    likes: int, created: date, half_life_days: float = config.POPULARITY_HALF_LIFE_DAYS
+) -> float:
+    """
+    Popularity score of a flow.
+    Without a half-life it is the number of likes. With it, a flow published one half-life
+    later ranks as high as one with twice as many likes plus one, so scores never need to be
+    decayed in place and only change when likes do. The first like counts as well.
+    """
+    if not half_life_days:
+        return float(likes)
+    age_bonus = (created - POPULARITY_EPOCH).days / half_life_days
+    return math.log2(likes + 1) + age_bonus
@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Sequence
+
+from PIL import Image
+
+import apps.interface_flows_api.config as config
+
+# levels from the largest, the full image is the screen image itself
+FULL = "full"
+SCALED_LEVELS = {"half": 2, "quarter": 4}
+PREVIEW = "preview"
+LEVELS = (FULL, *SCALED_LEVELS, PREVIEW)
+
+
+def get_level_name(name: str, level: str) -> str:
+    """Storage name of a level next to the full image, e.g. `a_01_half.jpeg`."""
+    root, extension = os.path.splitext(name)
+    return f"{root}_{level}{extension}"
+
+
+def _level_sizes(width: int, height: int, preview_width: int) -> Dict[str, tuple]:
+    """Sizes of levels smaller than the previous level, larger ones are skipped."""
+    sizes = {}
+    previous_width = width
+    targets = [(level, width // factor) for level, factor in SCALED_LEVELS.items()]
+    targets.append((PREVIEW, preview_width))
+    for level, level_width in targets:
+        if 0 < level_width < previous_width:
+            sizes[level] = (level_width, max(round(height * level_width / width), 1))
+            previous_width = level_width
+    return sizes
+
+
+def build_levels(image: bytes, preview_width: int) -> Dict[str, bytes]:
+    """
+    Downscaled JPEG levels of an image. JPEG sources are decoded directly at the
+    reduced scale, so the full image is never decoded for the smaller levels.
+    """
+    with Image.open(BytesIO(image)) as source:
+        sizes = _level_sizes(source.width, source.height, preview_width)
+    levels = {}
+    for level, size in sizes.items():
+        with Image.open(BytesIO(image)) as img:
+            img.draft("RGB", size)
+            img = img.convert("RGB")
+            if img.size != size:
+                img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+            buffered = BytesIO()
+            img.save(buffered, format="JPEG")
+            levels[level] = buffered.getvalue()
+    return levels
+
+
+def build_levels_many(
+    images: Sequence[bytes],
+    preview_width: int,
+    max_workers: int = config.ENCODER_WORKERS,
+) -> List[Dict[str, bytes]]:
+    """build_levels of images concurrently, Pillow releases the GIL while coding."""
+    if len(images) <= 1:
+        return [build_levels(image, preview_width) for image in images]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as pool:
+        return list(pool.map(lambda image: build_levels(image, preview_width), images))
@@ -1,13 +1,15 @@
 from io import BytesIO
+from math import ceil
+from typing import Dict, Iterable
 
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from PIL import Image
 
+# derivative format names with their Pillow encoders
+THUMBNAIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
 
-def resize_image(image: InMemoryUploadedFile) -> (BytesIO, str):
-    img = Image.open(image)
-    img_format = img.format.lower()
 
+def _crop_center(img: Image.Image) -> Image.Image:
     min_dimension = min(img.width, img.height)
 
     left = (img.width - min_dimension) // 2
@@ -15,9 +17,64 @@ def resize_image(image: InMemoryUploadedFile) -> (BytesIO, str):
     right = (img.width + min_dimension) // 2
     bottom = (img.height + min_dimension) // 2
 
-    img = img.crop((left, top, right, bottom))
+    return img.crop((left, top, right, bottom))
+
+
+def resize_image(image: InMemoryUploadedFile) -> (BytesIO, str):
+    img = Image.open(image)
+    img_format = img.format.lower()
+
+    img = _crop_center(img)
 
     buffered = BytesIO()
     img.save(buffered, format=img_format)
 
     return buffered, img_format
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """RGB image, transparent pixels are put on a white background."""
+    if img.mode == "RGB":
+        return img
+    background = Image.new("RGB", img.size, "white")
+    background.paste(img, mask=img.getchannel("A"))
+    return background
+
+
+def make_thumbnails(
+    image,
+    sizes: Iterable[int],
+    formats: Iterable[str] = tuple(THUMBNAIL_FORMATS),
+    quality: int = 80,
+) -> Dict[str, Dict[int, bytes]]:
+    """
+    Center-cropped square derivatives of an image for every format and size. Large
+    JPEG sources are decoded directly at a reduced scale and every size is downscaled
+    from the crop with a fast integer reduce before resampling. Sizes above the crop
+    are rendered at the crop size.
+    """
+    sizes = sorted(set(sizes), reverse=True)
+    img = Image.open(image)
+    scale = sizes[0] / min(img.width, img.height)
+    if scale < 1:
+        # only JPEG supports it, other decoders ignore the draft
+        img.draft("RGB", (ceil(img.width * scale), ceil(img.height * scale)))
+
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+    square = _crop_center(img).convert("RGBA" if has_alpha else "RGB")
+
+    thumbnails: Dict[str, Dict[int, bytes]] = {name: {} for name in formats}
+    for size in sizes:
+        side = min(size, square.width)
+        resized = square
+        if side != square.width:
+            resized = square.resize(
+                (side, side), Image.Resampling.LANCZOS, reducing_gap=3.0
+            )
+        for name in thumbnails:
+            encoder = THUMBNAIL_FORMATS[name]
+            thumbnail = resized if encoder == "WEBP" else _flatten(resized)
+            buffered = BytesIO()
+            thumbnail.save(buffered, format=encoder, quality=quality)
+            thumbnails[name][size] = buffered.getvalue()
+    return thumbnails
@@ -0,0 +1,60 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """
+    Term to document ids index for databases without full-text search.
+    Every query term has to match a document term or be its prefix, matches in the
+    first field of a document weigh more than in the others.
+    """
+
+    field_weights = (1.0, 0.4)
+
+    def __init__(self, documents: Iterable[Tuple[int, Iterable[Optional[str]]]]):
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        for document_id, fields in documents:
+            for weight, text in zip(self.field_weights, fields):
+                for term in tokenize(text):
+                    posting = self.postings[term]
+                    posting[document_id] = posting.get(document_id, 0) + weight
+        self.terms = sorted(self.postings)
+
+    def _match_term(self, query_term: str) -> Dict[int, float]:
+        """Scores of documents containing a term starting with `query_term`."""
+        scores: Dict[int, float] = {}
+        # terms are sorted, so the ones sharing the prefix follow each other
+        for term in islice(self.terms, bisect_left(self.terms, query_term), None):
+            if not term.startswith(query_term):
+                break
+            exact = 1.0 if term == query_term else 0.5
+            for document_id, weight in self.postings[term].items():
+                scores[document_id] = max(scores.get(document_id, 0), weight * exact)
+        return scores
+
+    def search(self, query: str) -> Dict[int, float]:
+        """Ranks of documents matching every query term."""
+        terms = tokenize(query)
+        if not terms:
+            return {}
+        ranks: Optional[Dict[int, float]] = None
+        for term in dict.fromkeys(terms):
+            scores = self._match_term(term)
+            if ranks is None:
+                ranks = scores
+                continue
+            matched: Set[int] = ranks.keys() & scores.keys()
+            ranks = {
+                document_id: ranks[document_id] + scores[document_id]
+                for document_id in matched
+            }
+        return ranks
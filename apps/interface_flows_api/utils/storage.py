@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+
+import apps.interface_flows_api.config as config
+
+
+def upload_files(
+    storage: Storage, files: Dict[str, bytes], max_workers: int = config.UPLOAD_WORKERS
+) -> Dict[str, str]:
+    """Save files concurrently, returns the names assigned by the storage for every file."""
+
+    def upload(name: str) -> str:
+        return storage.save(name, ContentFile(files[name], name=name))
+
+    if not files:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as pool:
+        return dict(zip(files, pool.map(upload, files)))
+
+
+def read_files(
+    storage: Storage, names: Iterable[str], max_workers: int = config.UPLOAD_WORKERS
+) -> Dict[str, bytes]:
+    """Read files concurrently, files which cannot be read are left out."""
+
+    def read(name: str):
+        try:
+            with storage.open(name) as file:
+                return file.read()
+        except OSError:
+            return None
+
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(names))) as pool:
+        files = dict(zip(names, pool.map(read, names)))
+    return {name: data for name, data in files.items() if data is not None}
@@ -0,0 +1,46 @@
+from typing import Iterator
+
+import cv2
+import numpy as np
+
+
+def get_frame_step(video: cv2.VideoCapture, interval: int) -> int:
+    fps = video.get(cv2.CAP_PROP_FPS)
+    return int(fps) * interval
+
+
+def estimate_sampled_frames(video_path: str, interval: int = 3) -> int:
+    """Number of frames `iter_video_frames` is expected to yield, based on container metadata."""
+    video = cv2.VideoCapture(video_path)
+    try:
+        frame_step = get_frame_step(video, interval)
+        total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        video.release()
+    if frame_step <= 0 or total_frames <= 0:
+        return 1
+    return -(-total_frames // frame_step)
+
+
+def iter_video_frames(video_path: str, interval: int = 3) -> Iterator[np.array]:
+    """
+    Decode a video forward once and lazily yield one frame per `interval` seconds.
+    Skipped frames are only grabbed, so no seeking and no decoding into BGR happens for them.
+    """
+    video = cv2.VideoCapture(video_path)
+    try:
+        if not video.isOpened():
+            raise ValueError(f"Unable to open video {video_path}")
+        frame_step = get_frame_step(video, interval)
+        if frame_step <= 0:
+            raise ValueError("Video frame rate is unknown")
+
+        frame_index = 0
+        while video.grab():
+            if frame_index % frame_step == 0:
+                success, frame = video.retrieve()
+                if success:
+                    yield frame
+            frame_index += 1
+    finally:
+        video.release()
@@ -1,36 +1,47 @@
 from django.core.exceptions import ObjectDoesNotExist
+from django.urls import reverse
 from rest_framework import status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.exceptions import NotFound, ParseError, PermissionDenied
 from rest_framework.generics import *
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.interface_flows_api.exceptions import (
-    MLServicesException, MLServicesUnavailableException, MLServiceUnavailable,
-    PrivateFlowException, UnverifiedFlowExists, UnverifiedFlowExistsException,
-    VideoProcessing, VideoProcessingException)
+from apps.interface_flows_api.authentication import CachedTokenAuthentication
+from apps.interface_flows_api.conditional import versioned_get
+from apps.interface_flows_api.exceptions import (PrivateFlowException,
+                                                 UnverifiedFlowExists,
+                                                 UnverifiedFlowExistsException)
+from apps.interface_flows_api.pagination import (CursorPaginationMixin,
+                                                 FlowsCursorPagination,
+                                                 FlowsPagination)
+from apps.interface_flows_api.selectors.catalog_selector import (
+    genre_catalog, platform_catalog)
 from apps.interface_flows_api.selectors.flow_selector import flow_selector
+from apps.interface_flows_api.selectors.search_selector import \
+    flow_search_selector
 from apps.interface_flows_api.serializers import *
 from apps.interface_flows_api.services.auth_service import auth_service
-from apps.interface_flows_api.services.flow_build_service import \
-    flow_build_service
+from apps.interface_flows_api.services.flow_cache_service import \
+    flow_cache_service
+from apps.interface_flows_api.services.flow_job_service import flow_job_service
 from apps.interface_flows_api.services.flow_social_service import \
     flow_social_service
+from apps.interface_flows_api.services.ml_provider import ml_service_provider
+from apps.interface_flows_api.services.version_service import version_service
 
 
-class FlowView(APIView):
-    """Controller to create a new flow or get list of views."""
+def get_flows_versions(request, *args, **kwargs):
+    """Flow listings embed flows with their genres and platforms."""
+    return version_service.get_many(
+        version_service.FLOWS, version_service.GENRES, version_service.PLATFORMS
+    ).values()
 
-    class FlowsPagination(PageNumberPagination):
-        """Simple flows pagination for listing."""
 
-        page_size = 10
-        page_size_query_param = "page_size"
-        max_page_size = 10
+@versioned_get(get_flows_versions, per_user=True)
+class FlowView(CursorPaginationMixin, APIView):
+    """Controller to create a new flow or get list of views."""
 
     pagination_class = FlowsPagination
     object_name = "flow"
@@ -46,23 +57,32 @@ class FlowView(APIView):
 
     def get_permissions(self):
         if self.request.method == "POST":
-            self.authentication_classes = [TokenAuthentication]
+            self.authentication_classes = [CachedTokenAuthentication]
             self.permission_classes = [IsAuthenticated]
         else:
             self.permission_classes = [AllowAny]
         return super().get_permissions()
 
-    def get(self, request, *args, **kwargs):
+    @staticmethod
+    def get_public_flows(request):
         sort_param = request.query_params.get("sort", "date")
         order_param = request.query_params.get("order", "desc")
         genres = request.query_params.getlist("genre", None)
         platforms = request.query_params.getlist("platform", None)
-
-        flows = flow_selector.get_public_flows(
-            sort_param, order_param, genres, platforms
+        genre_match = request.query_params.get("genre_match", "any")
+
+        return flow_selector.get_public_flows(
+            sort_param,
+            order_param,
+            genres,
+            platforms,
+            user=request.user,
+            genre_match=genre_match,
         )
 
-        paginator = self.pagination_class()
+    def get(self, request, *args, **kwargs):
+        flows = self.get_public_flows(request)
+        paginator = self.paginator
         page = paginator.paginate_queryset(flows, request, view=self)
         if page is not None:
             serializer = FlowSimpleSerializer(
@@ -96,7 +116,7 @@ class FlowView(APIView):
         serializer.is_valid(raise_exception=True)
 
         try:
-            flow = flow_build_service.create_new_flow(
+            job = flow_job_service.enqueue_flow_build(
                 **serializer.validated_data,
                 video_file=video_file,
                 thumbnail_file=thumbnail_file,
@@ -105,23 +125,56 @@ class FlowView(APIView):
                 platforms=platforms,
                 genres=genres,
             )
-            serializer = FlowSerializer(flow, context={"request": self.request})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
         except UnverifiedFlowExistsException:
             raise UnverifiedFlowExists()
-        except VideoProcessingException:
-            raise VideoProcessing()
-        except MLServicesUnavailableException:
-            raise MLServiceUnavailable()
-        except MLServicesException:
-            raise MLServiceUnavailable()
+        serializer = FlowBuildJobSerializer(job)
+        headers = {"Location": reverse("flow_job", args=[job.id])}
+        return Response(
+            serializer.data, status=status.HTTP_202_ACCEPTED, headers=headers
+        )
+
+
+@versioned_get(get_flows_versions, per_user=True)
+class FlowSearchView(ListAPIView):
+    """Controller to search public flows by their titles and sources."""
+
+    serializer_class = FlowSimpleSerializer
+    pagination_class = FlowsCursorPagination
 
+    def get_queryset(self):
+        query = self.request.query_params.get("q", "").strip()
+        if not query:
+            raise ParseError(detail="Search query is required.", code=400)
+        return flow_search_selector.search_public_flows(
+            query,
+            genres=self.request.query_params.getlist("genre", None),
+            platforms=self.request.query_params.getlist("platform", None),
+            genre_match=self.request.query_params.get("genre_match", "any"),
+            user=self.request.user,
+        )
+
+
+class FlowBuildJobView(RetrieveAPIView):
+    """Controller to track the progress of a flow build."""
+
+    serializer_class = FlowBuildJobSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        job_id = self.kwargs["pk"]
+        try:
+            return flow_selector.get_build_job(job_id=job_id, user=self.request.user)
+        except ObjectDoesNotExist:
+            raise NotFound(detail=f"Build job with id={job_id} not found.", code=404)
 
-class MyFlowView(ListAPIView):
+
+@versioned_get(get_flows_versions, per_user=True)
+class MyFlowView(CursorPaginationMixin, ListAPIView):
     """Controller to get flows created by a user."""
 
     serializer_class = FlowSimpleSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -129,11 +182,12 @@ class MyFlowView(ListAPIView):
         return flow_selector.get_my_flows(user)
 
 
-class LikedFlowView(ListAPIView):
+@versioned_get(get_flows_versions, per_user=True)
+class LikedFlowView(CursorPaginationMixin, ListAPIView):
     """Controller to get flows liked by a user."""
 
     serializer_class = FlowSimpleSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -145,15 +199,25 @@ class FlowVisibilityMixin:
     """Mixin to check if a user has rights to view a flow."""
 
     @staticmethod
-    def get_flow(flow_id, user):
+    def get_flow(flow_id, user, detail=False):
+        get_flow = (
+            flow_selector.get_flow_detail if detail else flow_selector.get_flow_by_id
+        )
         try:
-            return flow_selector.get_flow_by_id(flow_id=flow_id, user=user)
+            return get_flow(flow_id=flow_id, user=user)
         except ObjectDoesNotExist:
             raise NotFound(detail=f"Flow with id={flow_id} not found.", code=404)
         except PrivateFlowException:
             raise PermissionDenied(detail="Access to the flow is denied.", code=403)
 
 
+def get_flow_detail_versions(request, pk):
+    """Only cached details get validators, see FlowCacheService.get_cached_versions."""
+    versions = flow_cache_service.get_cached_versions(pk)
+    return None if versions is None else versions.values()
+
+
+@versioned_get(get_flow_detail_versions, per_user=True)
 class FlowDetailView(RetrieveAPIView, FlowVisibilityMixin):
     """Controller to retrieve a detailed flow."""
 
@@ -162,14 +226,46 @@ class FlowDetailView(RetrieveAPIView, FlowVisibilityMixin):
 
     def get_object(self):
         user = self.request.user
-        flow = self.get_flow(self.kwargs["pk"], user)
+        flow = self.get_flow(self.kwargs["pk"], user, detail=True)
         return flow
 
+    def retrieve(self, request, *args, **kwargs):
+        flow_id = self.kwargs["pk"]
+        versions = flow_cache_service.get_versions(flow_id, start_missing=False)
+        parts = (
+            {} if versions is None else flow_cache_service.get_parts(flow_id, versions)
+        )
+        if flow_cache_service.GRAPH in parts:
+            # only public flows are cached, the social part needs no access check
+            if flow_cache_service.SOCIAL not in parts:
+                flow = flow_selector.get_flow_social(flow_id)
+                social = FlowSocialSerializer(flow, context={"request": request}).data
+                parts[flow_cache_service.SOCIAL] = social
+                flow_cache_service.set_parts(
+                    flow_id, {flow_cache_service.SOCIAL: social}, versions
+                )
+            data = {
+                **parts[flow_cache_service.GRAPH],
+                **parts[flow_cache_service.SOCIAL],
+            }
+            data["is_liked"] = flow_cache_service.get_is_liked(flow_id, request.user)
+            return Response(data, status=status.HTTP_200_OK)
+
+        flow = self.get_object()
+        data = self.get_serializer(flow).data
+        if flow_cache_service.is_cacheable(flow):
+            if versions is None:
+                # started once the flow is known to exist, this render predates them
+                flow_cache_service.get_versions(flow_id)
+            else:
+                flow_cache_service.set_detail(flow_id, data, versions)
+        return Response(data, status=status.HTTP_200_OK)
+
 
 class FlowLikeView(APIView, FlowVisibilityMixin):
     """Controller to like or dislike a flow."""
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_flow_for_user(self, request, pk):
@@ -196,7 +292,7 @@ class FlowLikeView(APIView, FlowVisibilityMixin):
 class FlowCommentView(APIView, FlowVisibilityMixin):
     """Controller to create a new comment"""
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = CommentSerializer
 
@@ -228,19 +324,47 @@ class CreateUserView(CreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@versioned_get(lambda request: [version_service.get(version_service.GENRES)])
 class GenresView(ListAPIView):
     """Controller to retrieve all genres"""
 
-    queryset = Genre.objects.all()
     serializer_class = GenreSerializer
 
+    def get_queryset(self):
+        return genre_catalog.get_all()
+
+    def list(self, request, *args, **kwargs):
+        data = genre_catalog.get_rendered(
+            "list", lambda genres: self.get_serializer(genres, many=True).data
+        )
+        return Response(data, status=status.HTTP_200_OK)
+
 
+@versioned_get(lambda request: [version_service.get(version_service.PLATFORMS)])
 class PlatformsView(ListAPIView):
     """Controller to retrieve all platforms"""
 
-    queryset = Platform.objects.all()
     serializer_class = PlatformSerializer
 
+    def get_queryset(self):
+        return platform_catalog.get_all()
+
+    def list(self, request, *args, **kwargs):
+        data = platform_catalog.get_rendered(
+            "list", lambda platforms: self.get_serializer(platforms, many=True).data
+        )
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class MLServiceStatusView(APIView):
+    """Controller to inspect the ML service circuit breaker and latency"""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(ml_service_provider.get_status(), status=status.HTTP_200_OK)
+
 
 class CustomObtainAuthToken(ObtainAuthToken):
     def post(self, request, *args, **kwargs):
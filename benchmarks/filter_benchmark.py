@@ -0,0 +1,123 @@
+"""
+Benchmark of genre and platform filtering of the public flows listing: the former
+JOIN + DISTINCT plan against the EXISTS plan. Flows are seeded inside a transaction
+which is rolled back at the end.
+Run with `python -m benchmarks.filter_benchmark --flows 100000 --explain`.
+"""
+
+import argparse
+import os
+import random
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import transaction  # noqa: E402
+
+from apps.interface_flows_api.models import (Flow, FlowStatus,  # noqa: E402
+                                             Genre, Platform)
+from apps.interface_flows_api.selectors.flow_selector import \
+    flow_selector  # noqa: E402
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed_flows(count: int, genres: int, platforms: int, seed: int = 0) -> None:
+    """Public flows with one to three random genres and one or two random platforms."""
+    rng = random.Random(seed)
+    user = User.objects.create_user(username="filter_benchmark", password="x")
+    genre_ids = [
+        genre.id
+        for genre in Genre.objects.bulk_create(
+            Genre(name=f"benchmark_genre{i}") for i in range(genres)
+        )
+    ]
+    platform_ids = [
+        platform.id
+        for platform in Platform.objects.bulk_create(
+            Platform(name=f"benchmark_platform{i}") for i in range(platforms)
+        )
+    ]
+    flows = Flow.objects.bulk_create(
+        (
+            Flow(title=f"flow{i}", author=user.profile, status=FlowStatus.VERIFIED)
+            for i in range(count)
+        ),
+        batch_size=5000,
+    )
+    Flow.genres.through.objects.bulk_create(
+        (
+            Flow.genres.through(flow_id=flow.id, genre_id=genre_id)
+            for flow in flows
+            for genre_id in rng.sample(genre_ids, rng.randint(1, 3))
+        ),
+        batch_size=5000,
+    )
+    Flow.platforms.through.objects.bulk_create(
+        (
+            Flow.platforms.through(flow_id=flow.id, platform_id=platform_id)
+            for flow in flows
+            for platform_id in rng.sample(platform_ids, rng.randint(1, 2))
+        ),
+        batch_size=5000,
+    )
+
+
+def join_distinct_flows(genres, platforms):
+    """The plan get_public_flows used before: M2M joins with DISTINCT."""
+    flows = Flow.objects.filter(
+        visibility="PB", status=FlowStatus.VERIFIED, genres__name__in=genres
+    ).distinct()
+    flows = flows.filter(platforms__name__in=platforms).distinct()
+    return flows.order_by("-date", "-id")
+
+
+def measure(queryset, repeat: int, page_size: int = 10) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset[:page_size])
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flows", type=int, default=100_000)
+    parser.add_argument("--genres", type=int, default=20)
+    parser.add_argument("--platforms", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--explain", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            seed_flows(args.flows, args.genres, args.platforms)
+            genres = ["benchmark_genre0", "benchmark_genre1"]
+            platforms = ["benchmark_platform0"]
+            plans = {
+                "join + distinct": join_distinct_flows(genres, platforms),
+                "exists, any": flow_selector.get_public_flows(
+                    "date", "desc", genres, platforms
+                ),
+                "exists, all": flow_selector.get_public_flows(
+                    "date", "desc", genres, platforms, genre_match="all"
+                ),
+            }
+            for name, queryset in plans.items():
+                print(f"{name:>16}: {measure(queryset, args.repeat):9.1f} ms")
+                if args.explain:
+                    print(queryset[:10].explain())
+            raise Rollback()
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
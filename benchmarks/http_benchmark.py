@@ -0,0 +1,86 @@
+"""
+Load benchmark of the read endpoints served by WSGI workers against ASGI workers.
+Requests are sent by concurrent clients to a running server and the throughput with
+latency percentiles is reported. Start the server to compare with, for example:
+
+    gunicorn config.wsgi -w 4 -b 127.0.0.1:8000
+    ASYNC_READ_VIEWS=1 uvicorn config.asgi:application --workers 4 --port 8000
+
+and run `python -m benchmarks.http_benchmark --clients 64 --requests 5000`, adding
+`--token <key>` to exercise the authenticated path and `--path /api/flows/1/` for a detail.
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from typing import List, Optional, Tuple
+
+import requests
+
+
+def send(
+    session: requests.Session, url: str, headers: dict
+) -> Tuple[float, Optional[int]]:
+    started = time.perf_counter()
+    try:
+        status = session.get(url, headers=headers, timeout=30).status_code
+    except requests.RequestException:
+        status = None
+    return time.perf_counter() - started, status
+
+
+def run_client(
+    url: str, headers: dict, count: int
+) -> List[Tuple[float, Optional[int]]]:
+    with requests.Session() as session:
+        return [send(session, url, headers) for _ in range(count)]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/api/flows/")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--token", default=None)
+    args = parser.parse_args()
+
+    url = args.host.rstrip("/") + args.path
+    headers = {"Authorization": f"Token {args.token}"} if args.token else {}
+    per_client = max(args.requests // args.clients, 1)
+    # warm up connections, caches and catalogs of every worker
+    run_client(url, headers, 10)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        results = [
+            result
+            for client_results in executor.map(
+                run_client,
+                repeat(url, args.clients),
+                repeat(headers, args.clients),
+                repeat(per_client, args.clients),
+            )
+            for result in client_results
+        ]
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status is None or status >= 500)
+    print(f"{url}: {len(results)} requests by {args.clients} clients")
+    print(f"  throughput {len(results) / elapsed:10.1f} req/s, errors {errors}")
+    print(
+        f"  latency p50 {percentile(latencies, 0.5) * 1000:8.1f} ms,"
+        f" p99 {percentile(latencies, 0.99) * 1000:8.1f} ms,"
+        f" mean {statistics.mean(latencies) * 1000:8.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Benchmark of the flow graph layout on synthetic graphs.
+Run with `python -m benchmarks.layout_benchmark --screens 10000 50000`.
+"""
+
+import argparse
+import random
+import time
+
+from apps.interface_flows_api.utils.layout import compute_layout
+
+
+def make_graph(screens: int, branching: float = 0.3, seed: int = 0) -> dict:
+    """A long walk through the screens with occasional jumps and returns to visited ones."""
+    rng = random.Random(seed)
+    graph = {screen: [] for screen in range(screens)}
+    for screen in range(1, screens):
+        graph[screen - 1].append(screen)
+        if rng.random() < branching:
+            graph[screen].append(rng.randrange(screen))
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--screens", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for screens in args.screens:
+        graph = make_graph(screens)
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            compute_layout(graph)
+            timings.append(time.perf_counter() - started)
+        print(f"{screens:>9} screens: {min(timings) * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark of page number and cursor pagination of the public flows listing.
+Flows are seeded inside a transaction which is rolled back at the end.
+Run with `python -m benchmarks.pagination_benchmark --flows 100000 --pages 1 100 10000`.
+"""
+
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from apps.interface_flows_api.models import Flow, FlowStatus  # noqa: E402
+from apps.interface_flows_api.pagination import \
+    FlowsCursorPagination  # noqa: E402
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed_flows(count: int, per_day: int = 100) -> None:
+    """Public flows published `per_day` a day going back from today."""
+    user = User.objects.create_user(username="pagination_benchmark", password="x")
+    flows = Flow.objects.bulk_create(
+        (
+            Flow(title=f"flow{i}", author=user.profile, status=FlowStatus.VERIFIED)
+            for i in range(count)
+        ),
+        batch_size=5000,
+    )
+    today = date.today()
+    for i, flow in enumerate(flows):
+        flow.date = today - timedelta(days=i // per_day)
+    Flow.objects.bulk_update(flows, ["date"], batch_size=5000)
+
+
+def measure(client: Client, params: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(reverse("flows"), params)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    return min(timings) * 1000
+
+
+def cursor_at_page(page: int) -> dict:
+    """Cursor parameters of the given page, taken from the row just before it."""
+    params = {"pagination": "cursor"}
+    if page == 1:
+        return params
+    flows = Flow.objects.filter(status=FlowStatus.VERIFIED).order_by("-date", "-id")
+    last = flows[(page - 1) * FlowsCursorPagination.page_size - 1]
+    params["cursor"] = FlowsCursorPagination.encode_cursor(
+        [("date", True), ("id", True)], [last.date, last.id]
+    )
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flows", type=int, default=100_000)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 1000, 10_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client = Client()
+    try:
+        with transaction.atomic():
+            seed_flows(args.flows)
+            print(f"{'page':>7} {'page number, ms':>16} {'cursor, ms':>11}")
+            for page in args.pages:
+                page_number = measure(client, {"page": page}, args.repeat)
+                cursor = measure(client, cursor_at_page(page), args.repeat)
+                print(f"{page:>7} {page_number:>16.1f} {cursor:>11.1f}")
+            raise Rollback()
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
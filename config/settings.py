@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "corsheaders",
@@ -92,6 +94,31 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# file based cache is shared by the web and build worker processes of a host
+# with several hosts use a cache shared by all of them, e.g. Redis or Memcached,
+# cached tokens and catalogs are only revoked on the hosts sharing the cache
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "DJANGO_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "DJANGO_CACHE_LOCATION",
+            os.path.join(tempfile.gettempdir(), "interface_flows_cache"),
+        ),
+        # the file based cache lists its directory on every write to cull it,
+        # keep it for small deployments and use Redis or Memcached otherwise
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("DJANGO_CACHE_MAX_ENTRIES", 20000)),
+        },
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -138,7 +165,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "apps.interface_flows_api.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
 }